@@ -6,10 +6,13 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from dotenv import load_dotenv
 import models
 from database import get_db
+from cache import TTLCache
+from reference_cache import make_backend, MemoryGenerationBackend, CACHE_BACKEND_URL
 
 load_dotenv()
 
@@ -22,6 +25,16 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7 # 1 semaine
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token") # L'URL pour se connecter
 
+# Cache des utilisateurs connectés (clé = email du token + sa "génération")
+# Évite une requête SQL à chaque appel d'une route protégée.
+# ⚠️ Toute modification d'un user doit appeler invalidate_user(email) !
+# Invalider = incrémenter la génération de l'email, comme pour reference_cache.py : avec
+# CACHE_BACKEND_URL=redis://... tous les workers uvicorn la voient (un rôle retiré l'est partout, tout de suite).
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60")) # secondes
+principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+principal_generations = make_backend(CACHE_BACKEND_URL)
+
 # --- UTILITAIRES ---
 
 def verify_password(plain_password, hashed_password):
@@ -37,7 +50,32 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def principal_namespace(email: str) -> str:
+    return f"principal:{email}"
+
+async def principal_key(email: str):
+    # À calculer AVANT de lire la base (même raison que ReferenceCache.key)
+    namespace = principal_namespace(email)
+    if isinstance(principal_generations, MemoryGenerationBackend):
+        generation = principal_generations.generation(namespace) # En mémoire : instantané
+    else:
+        generation = await run_in_threadpool(principal_generations.generation, namespace) # Réseau : hors de la boucle
+    return (email, generation)
+
+def invalidate_user(*emails):
+    # À appeler après chaque modification d'un user (rôle, établissement, mot de passe...)
+    for email in emails:
+        if email:
+            principal_generations.bump(principal_namespace(email))
+
 # --- LE VIDEUR (PROTECTION DES ROUTES) ---
+def load_user(db: Session, email: str):
+    # Requête SQL synchrone : à lancer HORS de la boucle async (sinon elle bloque tout le worker)
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user is not None:
+        db.expunge(user) # On le détache de la session pour pouvoir le garder en cache
+    return user
+
 async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -51,8 +89,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == email).first()
+
+    # 1. Déjà en cache (et pas invalidé depuis) ? Pas besoin d'aller en base
+    key = await principal_key(email)
+    user = principal_cache.get(key)
+    if user is not None:
+        return user
+
+    # 2. Sinon on le charge dans un thread, pour ne pas bloquer les autres requêtes
+    user = await run_in_threadpool(load_user, db, email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    principal_cache.set(key, user)
+    return user
@@ -0,0 +1,93 @@
+"""Remplit worked_minutes / paid_minutes / cost_cents des shifts qui ne les ont pas encore.
+
+Usage (depuis backend-planning/, après `alembic upgrade head`) :
+    python backfill_shift_totals.py                     # tout, par paquets de 5000
+    python backfill_shift_totals.py --batch-size 1000 --pause 0.1
+
+Par paquets, un commit par paquet : les transactions restent courtes et la table n'est
+jamais bloquée longtemps. Reprise possible : seuls les shifts encore à NULL sont traités,
+on peut donc arrêter le job (Ctrl+C) et le relancer, il repart là où il en était.
+
+Chaque shift recalculé prend version + 1 et une ligne "updated" dans shift_changes :
+sinon l'ETag du planning ne bouge pas (304 avec les anciens totaux à NULL) et la synchro
+incrémentale ne renvoie jamais les nouveaux totaux.
+"""
+import argparse
+import time
+from sqlalchemy import select, update, bindparam
+import models, rota
+
+def backfill_batch(connection, after_id: int, batch_size: int):
+    # -> (nombre de shifts traités, dernier id vu)
+    Shift = models.Shift
+    rows = connection.execute(
+        select(
+            Shift.id, Shift.user_id, Shift.establishment_id, Shift.type, Shift.planned_start, Shift.planned_end,
+            Shift.break_type, Shift.break_duration, Shift.break_times, Shift.break_paid, models.User.hourly_rate,
+        )
+        .outerjoin(models.User, models.User.id == Shift.user_id)
+        .where(Shift.worked_minutes.is_(None), Shift.id > after_id)
+        .order_by(Shift.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0, after_id
+
+    params = []
+    for row in rows:
+        totals = rota.shift_totals(
+            row.type, row.planned_start, row.planned_end, row.break_duration, row.break_paid, row.hourly_rate,
+            row.break_type, row.break_times,
+        )
+        params.append({
+            "shift_id": row.id,
+            "new_worked": totals["worked_minutes"],
+            "new_paid": totals["paid_minutes"],
+            "new_break": totals["break_minutes"],
+            "new_cost": totals["cost_cents"],
+        })
+
+    shifts_table = Shift.__table__
+    connection.execute(
+        update(shifts_table)
+        .where(shifts_table.c.id == bindparam("shift_id"))
+        # Condition en plus : un shift recalculé par l'API entre-temps n'est pas écrasé
+        .where(shifts_table.c.worked_minutes.is_(None))
+        .values(
+            worked_minutes=bindparam("new_worked"), paid_minutes=bindparam("new_paid"),
+            break_minutes=bindparam("new_break"), cost_cents=bindparam("new_cost"),
+            version=shifts_table.c.version + 1, # Nouvel ETag pour le planning
+        ),
+        params,
+    )
+    models.log_shift_changes(connection, rows, "updated")
+    return len(rows), rows[-1].id
+
+def backfill(engine, batch_size: int = 5000, pause: float = 0.0, log=print) -> int:
+    total = 0
+    last_id = 0
+    started = time.perf_counter()
+    while True:
+        with engine.begin() as connection: # Un commit par paquet
+            count, last_id = backfill_batch(connection, last_id, batch_size)
+        if not count:
+            break
+        total += count
+        log(f"  {total} shifts calculés (dernier id : {last_id})")
+        if pause:
+            time.sleep(pause) # Laisse respirer la base en production
+    log(f"Terminé : {total} shifts en {time.perf_counter() - started:.1f}s")
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcule les totaux précalculés des anciens shifts")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Secondes d'attente entre deux paquets")
+    args = parser.parse_args()
+
+    from database import engine, require_database_url
+    require_database_url()
+    backfill(engine, args.batch_size, args.pause)
+
+if __name__ == "__main__":
+    main()
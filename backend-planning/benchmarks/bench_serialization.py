@@ -0,0 +1,63 @@
+"""Benchmark : chemin normal vs chemin rapide (?fast=true) sur GET /shifts.
+
+Usage (depuis backend-planning/) :
+    python benchmarks/bench_serialization.py --shifts 100000
+
+Crée une base SQLite temporaire, y insère N shifts, puis parcourt toutes
+les pages de /shifts (limit=1000) dans les deux modes et affiche le débit
+en lignes / seconde.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shifts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    # La base doit être configurée AVANT d'importer l'application
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from database import engine
+    from fastapi.testclient import TestClient
+    from benchmarks.seed import seed
+    seed(engine, establishments=1, users=args.users, shifts=args.shifts, log=lambda message: None)
+    import main as app_module
+
+    client = TestClient(app_module.app)
+
+    def run(fast: bool):
+        total, cursor = 0, None
+        started = time.perf_counter()
+        while True:
+            params = {"establishment_id": 1, "limit": args.page_size, "fast": fast}
+            if cursor:
+                params["cursor"] = cursor
+            page = client.get("/shifts", params=params).json()
+            total += len(page["items"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+        return total, time.perf_counter() - started
+
+    for label, fast in (("normal", False), ("fast  ", True)):
+        best = None
+        for _ in range(args.rounds):
+            total, elapsed = run(fast)
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{label} : {total} lignes en {best:.2f}s -> {total / best:,.0f} lignes/s")
+
+    engine.dispose()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""Benchmark de l'API, lancée en mémoire (pas de serveur uvicorn à démarrer).
+
+Usage (depuis backend-planning/) :
+    python benchmarks/run.py                              # petite base SQLite temporaire
+    python benchmarks/run.py --profile large              # 200 étab., 10k users, 2M shifts
+    python benchmarks/run.py --output bench_output.json   # résultats en JSON, pour comparer deux runs
+    python benchmarks/run.py --auth-delay 0.2             # recherche de l'user ralentie (voir auth_scaling)
+    DATABASE_URL=postgresql://... python benchmarks/run.py --no-seed   # base déjà remplie par seed.py
+
+Pour chaque scénario : latences p50 / p95 / p99 (ms) et débit (requêtes/s).
+
+Scénario "auth_scaling" : 1, 5, 10 puis 20 requêtes /users/me EN MÊME TEMPS, cache d'auth vidé,
+avec une recherche de l'user (auth.load_user) volontairement lente (--auth-delay). Si la recherche
+bloquait la boucle async, N requêtes prendraient N fois le délai ; elle tourne dans un thread,
+donc le temps total doit rester proche d'UN délai. Sinon le script sort en erreur (code 1).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+AUTH_SCALING_LEVELS = (1, 5, 10, 20) # Requêtes en vol en même temps
+
+PROFILES = {
+    "small": {"establishments": 20, "users": 1000, "shifts": 100_000},
+    "large": {"establishments": 200, "users": 10_000, "shifts": 2_000_000},
+}
+
+def percentile(sorted_values, pct):
+    # Méthode "nearest rank" : simple et sans dépendance
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "throughput_rps": round(count / elapsed, 1) if elapsed else 0.0,
+    }
+
+async def run_scenario(client, make_request, requests, concurrency):
+    # make_request(i) -> coroutine qui renvoie la réponse HTTP
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def auth_scaling(client, headers, delay):
+    # Chaque niveau : cache vidé, puis N requêtes lancées d'un coup -> toutes passent par load_user
+    import auth
+    original = auth.load_user
+    def slow_load_user(db, email):
+        time.sleep(delay) # Simule une base lente (réseau, verrous...) : bloquant, comme une vraie requête SQL
+        return original(db, email)
+
+    auth.load_user = slow_load_user
+    levels = []
+    try:
+        for in_flight in AUTH_SCALING_LEVELS:
+            auth.principal_cache.clear()
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(client.get("/users/me", headers=headers) for _ in range(in_flight)))
+            elapsed = time.perf_counter() - started
+            levels.append({
+                "in_flight": in_flight,
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "throughput_rps": round(in_flight / elapsed, 1),
+                "errors": sum(1 for response in responses if response.status_code >= 400),
+            })
+    finally:
+        auth.load_user = original
+
+    # Sérialisé = N requêtes coûtent N délais. On accepte jusqu'à la moitié (marge pour le reste de la requête).
+    slowest = levels[-1]
+    scales = slowest["elapsed_ms"] / 1000 < delay * slowest["in_flight"] / 2 and not any(level["errors"] for level in levels)
+    return {"delay_ms": round(delay * 1000, 3), "levels": levels, "scales": scales}
+
+async def run_all(app, volumes, args):
+    import httpx
+    from benchmarks.seed import BENCH_EMAIL, BENCH_PASSWORD, FIRST_DAY
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Un token pour les routes protégées
+        login = await client.post("/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        login.raise_for_status()
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        days = max(1, volumes["days"])
+        def random_week():
+            monday = FIRST_DAY + timedelta(days=rng.randrange(0, days, 7))
+            return monday, monday + timedelta(days=7)
+
+        def random_establishment():
+            return rng.randint(1, volumes["establishments"])
+
+        # Les shifts créés pendant le bench sont placés APRÈS les données générées (pas de chevauchement)
+        created_ids = []
+        future = FIRST_DAY + timedelta(days=days + 7)
+
+        async def token(i):
+            return await client.post("/token", data={"username": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+        async def users_me(i):
+            return await client.get("/users/me", headers=headers)
+
+        async def shifts_week(i):
+            start, end = random_week()
+            return await client.get("/shifts", params={
+                "establishment_id": random_establishment(),
+                "start": start.isoformat(), "end": end.isoformat(), "limit": 1000,
+            })
+
+        async def shift_templates(i):
+            return await client.get("/shift-templates", params={"establishment_id": random_establishment()})
+
+        async def create_shift(i):
+            # Un employé différent à chaque fois, et un nouveau jour quand on a fait le tour
+            day = future + timedelta(days=i // volumes["users"])
+            start = day + timedelta(hours=9)
+            response = await client.post("/shifts", json={
+                "user_id": i % volumes["users"] + 1,
+                "planned_start": start.isoformat(), "planned_end": (start + timedelta(hours=8)).isoformat(),
+                "position": "Bench", "break_duration": 30,
+            })
+            if response.status_code < 400:
+                created_ids.append(response.json()["id"])
+            return response
+
+        async def update_shift(i):
+            return await client.put(f"/shifts/{created_ids[i % len(created_ids)]}", json={"position": f"Bench {i}"})
+
+        async def delete_shift(i):
+            return await client.delete(f"/shifts/{created_ids[i]}")
+
+        results = {}
+        n, c = args.requests, args.concurrency
+        # /token : bcrypt est volontairement lent, on limite le nombre d'appels
+        results["token"] = await run_scenario(client, token, min(n, args.token_requests), c)
+        scaling = await auth_scaling(client, headers, args.auth_delay)
+        results["users_me"] = await run_scenario(client, users_me, n, c)
+        results["shifts_week"] = await run_scenario(client, shifts_week, n, c)
+        results["shift_templates"] = await run_scenario(client, shift_templates, n, c)
+        results["create_shift"] = await run_scenario(client, create_shift, n, c)
+        if created_ids:
+            results["update_shift"] = await run_scenario(client, update_shift, n, c)
+            results["delete_shift"] = await run_scenario(client, delete_shift, len(created_ids), c)
+        return results, scaling
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'API Planning")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--establishments", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--shifts", type=int)
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes par scénario")
+    parser.add_argument("--token-requests", type=int, default=20, help="Requêtes pour /token (bcrypt)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requêtes en vol en même temps")
+    parser.add_argument("--auth-delay", type=float, default=0.1, help="Délai ajouté à load_user pour auth_scaling (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-seed", action="store_true", help="Base déjà remplie (DATABASE_URL obligatoire)")
+    parser.add_argument("--output", help="Fichier JSON où écrire les résultats")
+    args = parser.parse_args()
+
+    volumes = dict(PROFILES[args.profile])
+    for key in ("establishments", "users", "shifts"):
+        if getattr(args, key) is not None:
+            volumes[key] = getattr(args, key)
+
+    # La base doit être configurée AVANT d'importer l'application
+    workdir = None
+    if not os.getenv("DATABASE_URL"):
+        if args.no_seed:
+            parser.error("--no-seed demande une DATABASE_URL")
+        workdir = tempfile.mkdtemp()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    from database import engine
+    from benchmarks.seed import seed
+    if args.no_seed:
+        volumes["days"] = (volumes["shifts"] + volumes["users"] - 1) // volumes["users"]
+    else:
+        print(f"Génération des données ({volumes['establishments']} étab., {volumes['users']} users, {volumes['shifts']} shifts)...")
+        volumes = seed(engine, volumes["establishments"], volumes["users"], volumes["shifts"], random_seed=args.seed)
+
+    import main as app_module
+    print(f"Benchmark : {args.requests} requêtes par scénario, concurrence {args.concurrency}")
+    results, scaling = asyncio.run(run_all(app_module.app, volumes, args))
+
+    print(f"\n{'scénario':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'erreurs':>9}")
+    for name, stats in results.items():
+        print(f"{name:<16}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['throughput_rps']:>10}{stats['errors']:>9}")
+
+    print(f"\nauth_scaling (load_user + {scaling['delay_ms']} ms, cache vidé)")
+    print(f"{'en vol':<16}{'total ms':>10}{'req/s':>10}{'erreurs':>9}")
+    for level in scaling["levels"]:
+        print(f"{level['in_flight']:<16}{level['elapsed_ms']:>10}{level['throughput_rps']:>10}{level['errors']:>9}")
+    print("OK : le débit monte avec les requêtes en vol" if scaling["scales"] else "ÉCHEC : les requêtes sont traitées l'une après l'autre")
+
+    if args.output:
+        import sqlalchemy
+        report = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat(),
+                "dialect": engine.dialect.name,
+                "python": platform.python_version(),
+                "sqlalchemy": sqlalchemy.__version__,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "volumes": volumes,
+            },
+            "results": results,
+            "auth_scaling": scaling,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRésultats écrits dans {args.output}")
+
+    engine.dispose()
+    if workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not scaling["scales"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Générateur de données synthétiques pour les benchmarks.
+
+Usage (depuis backend-planning/, avec DATABASE_URL dans l'environnement) :
+    python benchmarks/seed.py --establishments 200 --users 10000 --shifts 2000000
+
+Les données sont reproductibles (même --seed = même base) et insérées par
+paquets avec SQLAlchemy Core, pour que 2M de shifts tiennent en mémoire.
+La base doit être vide : les ids générés sont supposés commencer à 1.
+Le schéma est créé par les migrations (alembic upgrade head) : l'application démarre
+ensuite sur cette base, même avec SCHEMA_CHECK=strict.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Compte utilisé par les scénarios /token et /users/me
+BENCH_EMAIL = "bench-admin@example.com"
+BENCH_PASSWORD = "bench-password"
+
+# Premier jour des shifts générés : chaque employé a au plus un shift par jour à partir de là
+FIRST_DAY = datetime(2024, 1, 1)
+
+POSITIONS = ["Service", "Cuisine", "Bar", "Caisse", "Plonge"]
+TEMPLATE_HOURS = [("07:00", "15:00"), ("09:00", "17:00"), ("11:00", "15:00"), ("17:00", "23:00"), ("22:00", "06:00")]
+SHIFT_TYPES = ["work"] * 17 + ["vacation", "rtt", "sick"]
+
+def seed(engine, establishments=20, users=1000, shifts=100_000, templates=5, batch_size=10_000, random_seed=42, log=print):
+    import models, rota
+    from auth import get_password_hash
+    from database import upgrade_to_head
+
+    rng = random.Random(random_seed)
+    upgrade_to_head(engine)
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        # --- Établissements ---
+        conn.execute(models.Establishment.__table__.insert(), [
+            {"name": f"Établissement {i + 1}", "address": f"{i + 1} rue du Bench"}
+            for i in range(establishments)
+        ])
+
+        # --- Modèles de shifts (avec pauses) ---
+        template_rows = []
+        for est_id in range(1, establishments + 1):
+            for t in range(templates):
+                start_time, end_time = TEMPLATE_HOURS[t % len(TEMPLATE_HOURS)]
+                template_rows.append({
+                    "name": f"Modèle {t + 1}", "start_time": start_time, "end_time": end_time,
+                    "position": POSITIONS[t % len(POSITIONS)],
+                    "applicable_days": sorted(rng.sample(range(7), rng.randint(3, 7))),
+                    "break_type": "flexible", "break_duration": rng.choice([0, 15, 30, 45]),
+                    "break_times": None, "break_paid": rng.random() < 0.3,
+                    "establishment_id": est_id, "version": 1,
+                })
+        conn.execute(models.ShiftTemplate.__table__.insert(), template_rows)
+
+        # --- Utilisateurs (le 1er est l'admin qui se connecte pendant le bench) ---
+        hourly_rates = [] # Pour calculer le coût des shifts plus bas
+        bench_hash = get_password_hash(BENCH_PASSWORD) # bcrypt est lent : on ne hache qu'une fois
+        for offset in range(0, users, batch_size):
+            rows = []
+            for i in range(offset, min(users, offset + batch_size)):
+                hourly_rates.append(round(rng.uniform(11.5, 25), 2))
+                rows.append({
+                    "email": BENCH_EMAIL if i == 0 else f"user{i}@bench.example.com",
+                    "hashed_password": bench_hash if i == 0 else None,
+                    "full_name": f"Employé {i}",
+                    "role": "ADMIN" if i == 0 else "EMPLOYEE",
+                    "hourly_rate": hourly_rates[i],
+                    "establishment_id": i % establishments + 1,
+                    "version": 1,
+                })
+            conn.execute(models.User.__table__.insert(), rows)
+    log(f"  {establishments} établissements, {users} utilisateurs, {establishments * templates} modèles")
+
+    # --- Shifts : un par (employé, jour), répartis sur autant de jours que nécessaire ---
+    rows = []
+    inserted = 0
+    for i in range(shifts):
+        user_id = i % users + 1
+        day = FIRST_DAY + timedelta(days=i // users)
+        shift_type = rng.choice(SHIFT_TYPES)
+        start = day + timedelta(hours=rng.choice([7, 9, 11, 14, 17]))
+        duration = rng.choice([4, 6, 7, 8])
+        break_duration = rng.choice([0, 15, 30, 45]) if duration >= 6 else 0
+        position = rng.choice(POSITIONS) # Même ordre de tirages qu'avant : même --seed = mêmes données
+        break_paid = rng.random() < 0.3
+        totals = rota.shift_totals(shift_type, start, start + timedelta(hours=duration), break_duration, break_paid, hourly_rates[user_id - 1])
+        rows.append({
+            **totals,
+            "user_id": user_id, "establishment_id": (user_id - 1) % establishments + 1, "planned_start": start, "planned_end": start + timedelta(hours=duration),
+            "position": position, "type": shift_type,
+            "quantity": 1.0 if shift_type != "work" else None,
+            "break_type": "flexible", "break_duration": break_duration, "break_times": None,
+            "break_paid": break_paid, "version": 1,
+        })
+        if len(rows) >= batch_size:
+            with engine.begin() as conn:
+                conn.execute(models.Shift.__table__.insert(), rows)
+            inserted += len(rows)
+            rows = []
+            if inserted % (batch_size * 20) == 0:
+                log(f"  {inserted} shifts...")
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(models.Shift.__table__.insert(), rows)
+        inserted += len(rows)
+
+    log(f"  {inserted} shifts insérés en {time.perf_counter() - started:.1f}s")
+    return {
+        "establishments": establishments,
+        "users": users,
+        "shifts": inserted,
+        "templates": establishments * templates,
+        "days": (shifts + users - 1) // users if users else 0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Remplit la base DATABASE_URL avec des données de test")
+    parser.add_argument("--establishments", type=int, default=20)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--shifts", type=int, default=100_000)
+    parser.add_argument("--templates", type=int, default=5, help="Modèles par établissement")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from database import engine
+    seed(engine, args.establishments, args.users, args.shifts, args.templates, args.batch_size, args.seed)
+
+if __name__ == "__main__":
+    main()
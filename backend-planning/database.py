@@ -1,8 +1,14 @@
 import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
+from pool_metrics import PoolMetrics, TimedQueuePool, TimedAsyncQueuePool
+from replica import pinned_to_primary
+import metrics
 
 # 1. On charge le fichier .env pour pouvoir lire les secrets
 load_dotenv()
@@ -11,30 +17,183 @@ load_dotenv()
 # La variable doit avoir le même nom que dans ton fichier .env
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Petite sécurité : si l'URL est vide, on arrête tout de suite
-if not SQLALCHEMY_DATABASE_URL:
-    raise ValueError("ERREUR : DATABASE_URL est introuvable. Vérifie ton fichier .env !")
+# Petite sécurité : si l'URL est vide, on prévient dès la première utilisation de la base
+# (et pas à l'import : on peut importer l'app sans base, pour les tests ou la génération des migrations)
+MISSING_URL_ERROR = "ERREUR : DATABASE_URL est introuvable. Vérifie ton fichier .env !"
 
-# 3. Création du "Moteur" (Engine)
-# C'est l'objet qui gère la connexion réelle avec Supabase
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def require_database_url():
+    if not SQLALCHEMY_DATABASE_URL:
+        raise ValueError(MISSING_URL_ERROR)
+    return SQLALCHEMY_DATABASE_URL
 
-# 4. Création de la "Session"
+# 3. Réglages du pool de connexions (tout est dans le .env)
+# DB_POOL_MODE=null -> pas de pool côté app (à utiliser derrière pgbouncer / le pooler Supabase)
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))     # secondes d'attente max pour une connexion
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))     # on renouvelle les connexions de plus de 30 min
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes") # teste la connexion avant usage
+
+def engine_options(url: str, async_mode: bool = False) -> dict:
+    if DB_POOL_MODE == "null":
+        return {"poolclass": NullPool}
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        # SQLite en mémoire : SQLAlchemy impose son propre pool
+        return {}
+    return {
+        "poolclass": TimedAsyncQueuePool if async_mode else TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# 4. Création du "Moteur" (Engine)
+# C'est l'objet qui gère la connexion réelle avec Supabase.
+# create_engine ne se connecte pas : la 1re connexion n'est ouverte qu'à la 1re requête.
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL)) if SQLALCHEMY_DATABASE_URL else None
+
+# Compteurs du pool (connexions prêtées, overflow, temps d'attente...) et mesures par requête (/metrics)
+pool_metrics = PoolMetrics()
+if engine is not None:
+    pool_metrics.attach(engine.pool)
+    metrics.instrument_engine(engine)
+
+# 5. Création de la "Session"
 # Une session, c'est comme une "conversation" avec la base de données.
 # On l'ouvre, on fait des requêtes, et on la ferme.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# 5. La "Base" des modèles
+# 6. La "Base" des modèles
 # Toutes nos futures tables (Users, Shifts) vont hériter de cette classe.
 # Ça permet à SQLAlchemy de savoir quelles tables il doit gérer.
 Base = declarative_base()
 
-# 6. Fonction utilitaire pour FastAPI (Dependency)
+# 7. Fonction utilitaire pour FastAPI (Dependency)
 # Cette fonction sera appelée à chaque fois qu'on reçoit une requête (ex: créer un shift).
 # Elle ouvre une session, laisse faire le travail, et referme la session proprement (même si ça plante).
 def get_db():
+    require_database_url()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# 8. Mode ASYNC (optionnel) : USE_ASYNC_DB=1 dans le .env
+# Les routes de lecture les plus utilisées passent alors par un moteur async
+# (asyncpg pour Postgres, aiosqlite pour SQLite en local) au lieu du pool de threads.
+USE_ASYNC_DB = os.getenv("USE_ASYNC_DB", "0").lower() in ("1", "true", "yes")
+
+def to_async_url(url: str) -> str:
+    # "postgresql://..." -> "postgresql+asyncpg://...", "sqlite:///..." -> "sqlite+aiosqlite:///..."
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    for prefix, driver in (("postgresql", "asyncpg"), ("sqlite", "aiosqlite")):
+        if url.startswith(prefix + "://") or url.startswith(prefix + "+"):
+            return f"{prefix}+{driver}://" + url.split("://", 1)[1]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (to_async_url(SQLALCHEMY_DATABASE_URL) if SQLALCHEMY_DATABASE_URL else None)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, async_mode=True)) if USE_ASYNC_DB and ASYNC_DATABASE_URL else None
+async_pool_metrics = PoolMetrics()
+if async_engine is not None:
+    async_pool_metrics.attach(async_engine.sync_engine.pool)
+    metrics.instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False) if async_engine is not None else None
+
+# Équivalent async de get_db()
+async def get_async_db():
+    require_database_url()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# 9. Réplica de lecture (optionnel) : DATABASE_REPLICA_URL dans le .env
+# Les routes GET (planning, listes, stats, exports) lisent alors sur le réplica, les écritures
+# restent sur la base principale. Sans réplica, get_read_db() == get_db().
+# Un client qui vient d'écrire reste sur la base principale quelques secondes (voir replica.py).
+REPLICA_DATABASE_URL = os.getenv("DATABASE_REPLICA_URL")
+
+replica_engine = create_engine(REPLICA_DATABASE_URL, **engine_options(REPLICA_DATABASE_URL)) if REPLICA_DATABASE_URL else None
+replica_pool_metrics = PoolMetrics()
+if replica_engine is not None:
+    replica_pool_metrics.attach(replica_engine.pool)
+    metrics.instrument_engine(replica_engine)
+ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine) if replica_engine is not None else SessionLocal
+
+def read_session_factory(request: Request = None):
+    # Base principale si pas de réplica, ou si le client vient d'écrire
+    if replica_engine is None or (request is not None and pinned_to_primary(request)):
+        return SessionLocal
+    return ReplicaSessionLocal
+
+def get_read_db(request: Request):
+    require_database_url()
+    db = read_session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+ASYNC_REPLICA_DATABASE_URL = os.getenv("ASYNC_DATABASE_REPLICA_URL") or (to_async_url(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None)
+
+async_replica_engine = (
+    create_async_engine(ASYNC_REPLICA_DATABASE_URL, **engine_options(ASYNC_REPLICA_DATABASE_URL, async_mode=True))
+    if async_engine is not None and ASYNC_REPLICA_DATABASE_URL else None
+)
+async_replica_pool_metrics = PoolMetrics()
+if async_replica_engine is not None:
+    async_replica_pool_metrics.attach(async_replica_engine.sync_engine.pool)
+    metrics.instrument_engine(async_replica_engine.sync_engine)
+AsyncReplicaSessionLocal = (
+    async_sessionmaker(bind=async_replica_engine, autoflush=False, expire_on_commit=False)
+    if async_replica_engine is not None else AsyncSessionLocal
+)
+
+# Équivalent async de get_read_db()
+async def get_async_read_db(request: Request):
+    require_database_url()
+    factory = AsyncSessionLocal if async_replica_engine is None or pinned_to_primary(request) else AsyncReplicaSessionLocal
+    async with factory() as db:
+        yield db
+
+# 10. État des pools (pour /stats/db-pool)
+def pool_stats() -> dict:
+    stats = {"sync": pool_metrics.snapshot()} if engine is not None else {}
+    if async_engine is not None:
+        stats["async"] = async_pool_metrics.snapshot()
+    if replica_engine is not None:
+        stats["replica"] = replica_pool_metrics.snapshot()
+    if async_replica_engine is not None:
+        stats["async_replica"] = async_replica_pool_metrics.snapshot()
+    return stats
+
+# 11. Migrations (Alembic) : la base est-elle à jour ?
+# Les tables ne sont plus créées au démarrage de l'app : c'est "alembic upgrade head" qui s'en charge.
+# Au démarrage on vérifie seulement que la base est à la dernière révision (une requête, pas de DDL).
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+def schema_revisions():
+    # -> (révisions de la base, révisions "head" des scripts de migration)
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    require_database_url()
+    heads = set(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    return current, heads
+
+def upgrade_to_head(bind):
+    # Équivalent de "alembic upgrade head", sur le moteur donné (ex: seed des benchmarks)
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    with bind.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
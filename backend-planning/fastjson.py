@@ -0,0 +1,24 @@
+import orjson
+from fastapi import Response
+from pagination import split_page
+
+# Chemin "rapide" pour les grosses listes (?fast=true) :
+# - on ne lit que les colonnes utiles (pas d'objets ORM à construire)
+# - on ne repasse pas chaque ligne dans Pydantic
+# - on encode directement avec orjson
+# Le JSON produit est identique à celui du chemin normal.
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+def columns_for(model, schema):
+    # Les colonnes du modèle SQLAlchemy qui correspondent aux champs du schéma de réponse
+    return [getattr(model, name) for name in schema.model_fields]
+
+def fast_page(rows, limit: int, cursor_of):
+    page = split_page(rows, limit, cursor_of)
+    page["items"] = [row._asdict() for row in page["items"]]
+    return FastJSONResponse(page)
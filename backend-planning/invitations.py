@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import models, auth
+
+# Invitations par email via une "outbox" en base :
+# 1. la route écrit l'user ET sa ligne d'invitation dans la même transaction (rien ne se perd)
+# 2. le worker (lancé au démarrage de l'app) lit les invitations en attente par paquets et les envoie
+# La requête HTTP répond donc dès le commit, sans attendre l'envoi des emails.
+
+logger = logging.getLogger("planning.invitations")
+
+INVITATION_BATCH_SIZE = int(os.getenv("INVITATION_BATCH_SIZE", "100"))
+INVITATION_POLL_SECONDS = float(os.getenv("INVITATION_POLL_SECONDS", "2"))
+INVITATION_MAX_ATTEMPTS = int(os.getenv("INVITATION_MAX_ATTEMPTS", "5")) # Au-delà, on abandonne (last_error garde la raison)
+INVITATION_WORKER = os.getenv("INVITATION_WORKER", "1").lower() in ("1", "true", "yes")
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
+
+def invite_link(email: str) -> str:
+    # Le token est créé à l'envoi : sa durée de validité part du moment où l'email part
+    invite_token = auth.create_access_token(data={"sub": email, "type": "invite"})
+    return f"{FRONTEND_URL}/setup-password?token={invite_token}"
+
+# --- Envoi des emails ---
+# Un "sender" a une méthode send(email, full_name, link). Une exception = échec, on réessaiera.
+class ConsoleSender:
+    # En local : l'email est affiché dans la console (c'est ici qu'on branchera SendGrid/Gmail plus tard)
+    def send(self, email: str, full_name: str, link: str):
+        print("\n" + "="*60)
+        print(f"📧 [EMAIL SIMULÉ] Envoyé à {email}")
+        print(f"👋 Bonjour {full_name}, bienvenue dans l'équipe !")
+        print(f"🔗 Cliquez ici pour créer votre mot de passe :")
+        print(f"{link}")
+        print("="*60 + "\n")
+
+class MemorySender:
+    # Pour les tests : garde les emails "envoyés" dans une liste
+    def __init__(self):
+        self.sent = []
+
+    def send(self, email: str, full_name: str, link: str):
+        self.sent.append({"email": email, "full_name": full_name, "link": link})
+
+SENDERS = {"console": ConsoleSender, "memory": MemorySender}
+sender = SENDERS[os.getenv("INVITATION_SENDER", "console").lower()]()
+
+def set_sender(new_sender):
+    global sender
+    sender = new_sender
+
+# --- Écriture dans l'outbox (dans la transaction de l'appelant, pas de commit ici) ---
+def enqueue_invitations(db: Session, users: List[models.User]):
+    rows = [{"user_id": user.id, "email": user.email, "full_name": user.full_name} for user in users]
+    if rows:
+        db.execute(models.InvitationOutbox.__table__.insert(), rows)
+
+# --- Vidage de l'outbox ---
+def drain_outbox(session_factory, batch_size: int = INVITATION_BATCH_SIZE) -> int:
+    # Envoie UN paquet d'invitations en attente, renvoie le nombre d'envois réussis
+    db = session_factory()
+    try:
+        pending = db.execute(
+            select(models.InvitationOutbox)
+            .where(models.InvitationOutbox.sent_at.is_(None))
+            .where(models.InvitationOutbox.attempts < INVITATION_MAX_ATTEMPTS)
+            .order_by(models.InvitationOutbox.id)
+            .limit(batch_size)
+            # Postgres : plusieurs workers (uvicorn --workers) ne prennent jamais la même ligne
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+
+        sent = 0
+        for invitation in pending:
+            invitation.attempts += 1
+            try:
+                sender.send(invitation.email, invitation.full_name, invite_link(invitation.email))
+            except Exception as exc:
+                invitation.last_error = str(exc)[:500]
+                logger.warning("Invitation %s pour %s non envoyée : %s", invitation.id, invitation.email, exc)
+                continue
+            invitation.sent_at = datetime.utcnow()
+            invitation.last_error = None
+            sent += 1
+        db.commit()
+        return sent
+    finally:
+        db.close()
+
+def drain_all(session_factory, batch_size: int = INVITATION_BATCH_SIZE) -> int:
+    # Vide toute l'outbox (paquet après paquet)
+    total = 0
+    while True:
+        sent = drain_outbox(session_factory, batch_size)
+        total += sent
+        if sent < batch_size:
+            return total
+
+async def run_worker(session_factory, poll_seconds: float = INVITATION_POLL_SECONDS):
+    # Tâche de fond de l'app : les requêtes SQL et les envois tournent dans un thread
+    while True:
+        try:
+            await run_in_threadpool(drain_all, session_factory)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Erreur du worker d'invitations")
+        await asyncio.sleep(poll_seconds)
+
+if __name__ == "__main__":
+    # Vidage à la main (ex: worker désactivé avec INVITATION_WORKER=0) : python invitations.py
+    from database import SessionLocal
+    print(f"{drain_all(SessionLocal)} invitation(s) envoyée(s)")
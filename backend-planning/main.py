@@ -1,31 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select, insert, update, bindparam, and_, or_
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from database import engine, get_db
-import models, schemas, auth
+from collections import Counter
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, date, timedelta
+import asyncio
+import hashlib
+import logging
+import os
+import csv
+import io
+import json
+from database import schema_revisions, SessionLocal, get_db, get_async_db, get_read_db, get_async_read_db, read_session_factory, REPLICA_DATABASE_URL, USE_ASYNC_DB, pool_stats
+import models, schemas, auth, rota, metrics, replica, invitations
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, decode_id_cursor, split_page
+from fastjson import columns_for, fast_page
+from reference_cache import reference_cache, cache_control, templates_namespace, ESTABLISHMENTS_NAMESPACE
 from typing import Optional
 from fastapi.security import OAuth2PasswordRequestForm
 
 
-# Création des tables
-models.Base.metadata.create_all(bind=engine)
+# Les routes sont déclarées sur un router : l'application elle-même est construite par create_app() (en bas du fichier)
+router = APIRouter()
 
-app = FastAPI(title="Planning SaaS API")
-
-# Configuration CORS (Pour que le Front puisse parler au Back)
-origins = ["http://localhost:5173", "http://localhost:3000"]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 # ==========================
 # 🔐 AUTHENTIFICATION (LOGIN)
 # ==========================
-@app.post("/token", response_model=schemas.Token)
+@router.post("/token", response_model=schemas.Token)
 def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     # 1. On cherche l'user par son email (username dans le form = email)
     user = db.query(models.User).filter(models.User.email == form_data.username).first()
@@ -43,16 +51,17 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     return {"access_token": access_token, "token_type": "bearer"}
 
 # --- ROUTE DE TEST (La racine /) ---
-@app.get("/")
+@router.get("/")
 def read_root():
     return {"message": "API Connectée et Prête !"}
 
 # --- ÉTABLISSEMENTS ---
-@app.post("/establishments", response_model=schemas.EstablishmentResponse) # PAS DE SLASH A LA FIN
+@router.post("/establishments", response_model=schemas.EstablishmentResponse) # PAS DE SLASH A LA FIN
 def create_establishment(establishment: schemas.EstablishmentCreate, db: Session = Depends(get_db)):
     db_est = models.Establishment(**establishment.dict())
     db.add(db_est)
     db.commit()
+    reference_cache.invalidate(ESTABLISHMENTS_NAMESPACE) # Write-through : la liste en cache est périmée
     db.refresh(db_est)
     return db_est
 
@@ -60,7 +69,7 @@ def create_establishment(establishment: schemas.EstablishmentCreate, db: Session
 # ==========================
 # 📩 INVITATION (Par le Manager)
 # ==========================
-@app.post("/users", response_model=schemas.UserResponse)
+@router.post("/users", response_model=schemas.UserResponse)
 def invite_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     # 1. Vérif email
     if db.query(models.User).filter(models.User.email == user.email).first():
@@ -71,30 +80,139 @@ def invite_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     new_user = models.User(**user.dict(), hashed_password=None)
     
     db.add(new_user)
+    db.flush() # Pour avoir new_user.id
+
+    # 3. L'INVITATION part dans l'outbox, dans la même transaction que l'user :
+    # c'est le worker (invitations.py) qui génère le lien et envoie l'email, après la réponse
+    invitations.enqueue_invitations(db, [new_user])
     db.commit()
     db.refresh(new_user)
     
-    # 3. GÉNÉRATION DU LIEN D'INVITATION
-    # On crée un token spécial qui contient l'email de l'invité
-    invite_token = auth.create_access_token(data={"sub": new_user.email, "type": "invite"})
-    
-    invite_link = f"http://localhost:5173/setup-password?token={invite_token}"
-    
-    # 4. SIMULATION EMAIL (C'est ici qu'on branchera SendGrid/Gmail plus tard)
-    print("\n" + "="*60)
-    print(f"📧 [EMAIL SIMULÉ] Envoyé à {new_user.email}")
-    print(f"👋 Bonjour {new_user.full_name}, bienvenue dans l'équipe !")
-    print(f"🔗 Cliquez ici pour créer votre mot de passe :")
-    print(f"{invite_link}")
-    print("="*60 + "\n")
-    
     return new_user
 
+# ==========================
+# 👥 IMPORT D'ÉQUIPE EN MASSE (JSON ou CSV)
+# ==========================
+USER_IMPORT_MAX_ROWS = 5000
+
+def parse_users_csv(text: str) -> List[dict]:
+    # En-tête attendu : email,full_name,role,hourly_rate,establishment_id,manager_id
+    # Virgule ou point-virgule (Excel en français), cases vides = valeur par défaut
+    text = text.lstrip("\ufeff") # BOM ajouté par Excel
+    try:
+        dialect = csv.Sniffer().sniff(text.split("\n", 1)[0], delimiters=",;")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    rows = [
+        {key.strip(): value.strip() for key, value in row.items() if key and isinstance(value, str) and value.strip()}
+        for row in reader
+    ]
+    if dialect.delimiter == ";":
+        # Excel en français écrit aussi les décimales avec une virgule : "12,5"
+        for row in rows:
+            if "hourly_rate" in row:
+                row["hourly_rate"] = row["hourly_rate"].replace(",", ".")
+    return rows
+
+async def read_users_payload(request: Request) -> list:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    body = await request.body()
+    if content_type in ("text/csv", "application/csv"):
+        try:
+            return parse_users_csv(body.decode("utf-8"))
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="Le CSV doit être encodé en UTF-8")
+    try:
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="JSON invalide")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=422, detail="Une liste d'utilisateurs est attendue")
+    return items
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])} : {e['msg']}" for e in error.errors())
+
+def import_users(db: Session, items: list):
+    if len(items) > USER_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"{USER_IMPORT_MAX_ROWS} utilisateurs maximum par import")
+
+    # 1. Validation élément par élément (une ligne invalide n'empêche pas les autres)
+    errors = []
+    candidates = [] # (index d'origine, user)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(schemas.UserBulkError(index=index, detail="Objet attendu"))
+            continue
+        try:
+            candidates.append((index, schemas.UserCreate(**item)))
+        except ValidationError as e:
+            # L'email n'est repris que si c'est du texte (sinon l'erreur elle-même ne se construirait pas)
+            email = item.get("email")
+            errors.append(schemas.UserBulkError(
+                index=index, email=email if isinstance(email, str) else None, detail=validation_message(e),
+            ))
+
+    # 2. Emails déjà pris et établissements existants : UNE requête IN chacun (et pas une par ligne)
+    emails = {user.email for _, user in candidates}
+    taken = set(db.execute(select(models.User.email).where(models.User.email.in_(emails))).scalars()) if emails else set()
+    establishment_ids = {user.establishment_id for _, user in candidates}
+    known_establishments = set(db.execute(
+        select(models.Establishment.id).where(models.Establishment.id.in_(establishment_ids))
+    ).scalars()) if establishment_ids else set()
+
+    rows = []
+    seen = set()
+    for index, user in candidates:
+        if user.email in taken:
+            errors.append(schemas.UserBulkError(index=index, email=user.email, detail="Email déjà pris"))
+        elif user.email in seen:
+            errors.append(schemas.UserBulkError(index=index, email=user.email, detail="Email en double dans l'import"))
+        elif user.establishment_id not in known_establishments:
+            errors.append(schemas.UserBulkError(index=index, email=user.email, detail="Établissement introuvable"))
+        else:
+            seen.add(user.email)
+            rows.append({**user.dict(), "hashed_password": None})
+    errors.sort(key=lambda error: error.index)
+    if not rows:
+        return {"created": [], "errors": errors}
+
+    # 3. Un seul INSERT groupé + les invitations dans l'outbox, un seul commit
+    try:
+        new_users = db.execute(insert(models.User).returning(models.User), rows).scalars().all()
+        ids = [user.id for user in new_users]
+        invitations.enqueue_invitations(db, new_users)
+        db.commit()
+    except IntegrityError:
+        # Un autre import a pris un de ces emails entre la vérif et l'INSERT
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Un email a été pris pendant l'import, réessayez")
+
+    created = db.query(models.User).filter(models.User.id.in_(ids)).order_by(models.User.id).all()
+    return {"created": created, "errors": errors}
+
+USERS_BULK_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "application/json": {"schema": {"type": "array", "items": {"$ref": "#/components/schemas/UserCreate"}}},
+            "text/csv": {"schema": {"type": "string", "example": "email,full_name,role,hourly_rate,establishment_id\nmarie@exemple.fr,Marie Curie,employee,12.5,1\n"}},
+        },
+    }
+}
+
+@router.post("/users/bulk", response_model=schemas.UserBulkResponse, openapi_extra=USERS_BULK_BODY)
+async def create_users_bulk(request: Request, db: Session = Depends(get_db)):
+    # Le corps est lu à la main pour accepter JSON ou CSV ; le travail en base tourne dans un thread
+    items = await read_users_payload(request)
+    return await run_in_threadpool(import_users, db, items)
+
 
 # ==========================
 # 🔑 DÉFINITION DU MOT DE PASSE (Par l'Employé)
 # ==========================
-@app.post("/setup-password")
+@router.post("/setup-password")
 def setup_password(setup_data: schemas.UserSetup, db: Session = Depends(get_db)):
     # 1. On décode le token pour retrouver l'email
     try:
@@ -115,36 +233,73 @@ def setup_password(setup_data: schemas.UserSetup, db: Session = Depends(get_db))
     user.hashed_password = hashed_pwd
     
     db.commit()
+    auth.invalidate_user(email)
     
     return {"message": "Mot de passe défini avec succès ! Vous pouvez vous connecter."}
 
-@app.get("/users/me", response_model=schemas.UserResponse)
+@router.get("/users/me", response_model=schemas.UserResponse)
 def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
     return current_user
 
-@app.get("/users", response_model=List[schemas.UserResponse])
-def read_users(
-    skip: int = 0, 
-    limit: int = 100, 
-    establishment_id: Optional[int] = None, # <--- LE FILTRE EST ICI
-    db: Session = Depends(get_db)
-):
-    query = db.query(models.User)
+# La requête est construite une seule fois, puis exécutée en sync OU en async (USE_ASYNC_DB)
+# Pagination par curseur sur l'id : on demande limit + 1 lignes pour savoir s'il y a une suite
+def users_query(cursor: Optional[str], limit: int, establishment_id: Optional[int]):
+    query = select(models.User)
     
     # Si on fournit un ID, on filtre. Sinon, on renvoie tout.
     if establishment_id:
-        query = query.filter(models.User.establishment_id == establishment_id)
+        query = query.where(models.User.establishment_id == establishment_id)
+
+    after_id = decode_id_cursor(cursor)
+    if after_id:
+        query = query.where(models.User.id > after_id)
         
-    return query.offset(skip).limit(limit).all()
+    return query.order_by(models.User.id).limit(limit + 1)
+
+def id_cursor(row):
+    return {"id": row.id}
+
+# Colonnes lues par le chemin rapide (?fast=true) : exactement les champs des schémas de réponse
+USER_COLUMNS = columns_for(models.User, schemas.UserResponse)
+SHIFT_COLUMNS = columns_for(models.Shift, schemas.ShiftResponse)
+
+def read_users(
+    cursor: Optional[str] = None, # "next_cursor" de la page précédente
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    establishment_id: Optional[int] = None, # <--- LE FILTRE EST ICI
+    fast: bool = False, # Colonnes brutes + orjson, sans objets ORM ni Pydantic
+    db: Session = Depends(get_read_db)
+):
+    query = users_query(cursor, limit, establishment_id)
+    if fast:
+        return fast_page(db.execute(query.with_only_columns(*USER_COLUMNS)).all(), limit, id_cursor)
+    rows = db.execute(query).scalars().all()
+    return split_page(rows, limit, id_cursor)
+
+async def read_users_async(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    establishment_id: Optional[int] = None,
+    fast: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    query = users_query(cursor, limit, establishment_id)
+    if fast:
+        result = await db.execute(query.with_only_columns(*USER_COLUMNS))
+        return fast_page(result.all(), limit, id_cursor)
+    result = await db.execute(query)
+    return split_page(result.scalars().all(), limit, id_cursor)
+
+router.get("/users", response_model=schemas.UserPage)(read_users_async if USE_ASYNC_DB else read_users)
 
 # main.py
 
 # ... (Assure-toi que auth est importé)
 
-@app.get("/users/{user_id}", response_model=schemas.UserResponse)
+@router.get("/users/{user_id}", response_model=schemas.UserResponse)
 def read_user(
     user_id: int, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(auth.get_current_user) # <--- ON VÉRIFIE L'IDENTITÉ
 ):
     # 1. On cherche l'utilisateur cible (celui qu'on veut voir)
@@ -170,7 +325,7 @@ def read_user(
     # 3. Si aucune condition n'est remplie -> DEHORS !
     raise HTTPException(status_code=403, detail="Accès interdit : Vous n'avez pas les droits sur cet employé.")
 
-@app.put("/users/{user_id}", response_model=schemas.UserResponse)
+@router.put("/users/{user_id}", response_model=schemas.UserResponse)
 def update_user(
     user_id: int, 
     user_update: schemas.UserUpdate, 
@@ -197,32 +352,140 @@ def update_user(
         if db_user.role in [models.UserRole.MANAGER, models.UserRole.ADMIN] and db_user.id != current_user.id:
              raise HTTPException(status_code=403, detail="Vous ne pouvez pas modifier un supérieur")
 
+    # 3. Seul un Admin peut muter un employé dans un autre établissement
+    if "establishment_id" in user_update.dict(exclude_unset=True) and current_user.role != models.UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Seul un administrateur peut changer l'établissement")
+
     # (L'Admin passe toutes ces vérifs implicitement)
 
     # --- FIN SÉCURITÉ ---
 
+    old_email = db_user.email
+    old_rate = db_user.hourly_rate
     update_data = user_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_user, key, value)
+
+    # Nouveau taux horaire : le coût de ses shifts est recalculé dans la même transaction
+    if db_user.hourly_rate != old_rate:
+        recompute_shift_costs(db, db_user.id, db_user.hourly_rate)
     
     db.commit()
+    # Le rôle / l'établissement ont pu changer : on vide le cache d'auth tout de suite
+    auth.invalidate_user(old_email, update_data.get("email"))
     db.refresh(db_user)
     return db_user
 
+SHIFT_COST_BATCH_SIZE = 1000
+
+def recompute_shift_costs(db: Session, user_id: int, hourly_rate: float):
+    # cost_cents = paid_minutes x taux : seul le coût change, les minutes restent les mêmes.
+    # On relit (id, paid_minutes) et on écrit par paquets (executemany), version +1 et journal
+    # pour que le planning (ETag) et la synchro (/shifts/changes) voient le nouveau coût.
+    shifts_table = models.Shift.__table__
+    rows = db.execute(
+        select(models.Shift.id, models.Shift.user_id, models.Shift.establishment_id, models.Shift.paid_minutes)
+        .where(models.Shift.user_id == user_id, models.Shift.paid_minutes.is_not(None))
+        .order_by(models.Shift.id)
+    ).all()
+    statement = (
+        update(shifts_table)
+        .where(shifts_table.c.id == bindparam("shift_id"))
+        .values(cost_cents=bindparam("new_cost"), version=shifts_table.c.version + 1)
+    )
+    for offset in range(0, len(rows), SHIFT_COST_BATCH_SIZE):
+        batch = rows[offset:offset + SHIFT_COST_BATCH_SIZE]
+        db.connection().execute(statement, [
+            {"shift_id": row.id, "new_cost": rota.cost_cents(row.paid_minutes, hourly_rate)} for row in batch
+        ])
+        models.log_shift_changes(db.connection(), batch, "updated")
+
 # --- ROUTES POUR LES SHIFTS ---
 
+# ==========================
+# ⛔ CHEVAUCHEMENTS (un employé ne peut pas être à deux endroits en même temps)
+# ==========================
+# Un shift ne dure jamais plus que ça : ça donne une borne basse à la recherche
+# sur l'index (user_id, planned_start), au lieu de relire tout l'historique de l'employé.
+MAX_SHIFT_DURATION = timedelta(hours=24)
+
+def check_shift_interval(start: datetime, end: datetime):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="La fin doit être après le début")
+    if end - start > MAX_SHIFT_DURATION:
+        raise HTTPException(status_code=400, detail="Un shift ne peut pas dépasser 24h")
+
+def conflicting_shift_ids(db: Session, user_id: int, start: datetime, end: datetime, exclude_id: Optional[int] = None) -> List[int]:
+    query = select(models.Shift.id).where(
+        models.Shift.user_id == user_id,
+        models.Shift.planned_start < end,
+        models.Shift.planned_start > start - MAX_SHIFT_DURATION,
+        models.Shift.planned_end > start,
+    )
+    if exclude_id is not None:
+        query = query.where(models.Shift.id != exclude_id)
+    return list(db.execute(query.order_by(models.Shift.planned_start)).scalars())
+
+def raise_if_conflicts(conflicts: List[int]):
+    if conflicts:
+        raise HTTPException(status_code=409, detail={
+            "message": "Cet employé a déjà un shift sur ce créneau",
+            "conflicting_shift_ids": conflicts,
+        })
+
+def find_batch_conflicts(db: Session, proposals: List[tuple]) -> dict:
+    # proposals : liste de (user_id, début, fin)
+    # Vérifie tout le lot contre la base ET contre lui-même, en une requête + un tri.
+    # Renvoie {index: {"shift_ids": {...}, "indexes": {...}}} pour les éléments en conflit.
+    if not proposals:
+        return {}
+    user_ids = {user_id for user_id, _, _ in proposals}
+    min_start = min(start for _, start, _ in proposals)
+    max_end = max(end for _, _, end in proposals)
+    existing = db.execute(
+        select(models.Shift.id, models.Shift.user_id, models.Shift.planned_start, models.Shift.planned_end).where(
+            models.Shift.user_id.in_(user_ids),
+            models.Shift.planned_start < max_end,
+            models.Shift.planned_start > min_start - MAX_SHIFT_DURATION,
+        )
+    ).all()
+
+    intervals = [(("db", row.id), row.user_id, row.planned_start, row.planned_end) for row in existing]
+    intervals += [(("new", index), user_id, start, end) for index, (user_id, start, end) in enumerate(proposals)]
 
-@app.post("/shifts", response_model=schemas.ShiftResponse)
+    conflicts = {}
+    for a, b in rota.find_overlaps(intervals):
+        for mine, other in ((a, b), (b, a)):
+            if mine[0] != "new":
+                continue
+            entry = conflicts.setdefault(mine[1], {"shift_ids": set(), "indexes": set()})
+            entry["shift_ids" if other[0] == "db" else "indexes"].add(other[1])
+    return conflicts
+
+
+@router.post("/shifts", response_model=schemas.ShiftResponse)
 def create_shift(shift: schemas.ShiftCreate, db: Session = Depends(get_db)):
     # 1. Vérif optionnelle (est-ce que l'user existe ?)
     user = db.query(models.User).filter(models.User.id == shift.user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur introuvable")
 
+    # 1 bis. Pas de double réservation
+    check_shift_interval(shift.planned_start, shift.planned_end)
+    raise_if_conflicts(conflicting_shift_ids(db, shift.user_id, shift.planned_start, shift.planned_end))
+
     # 2. Création
     # L'étoile **shift.dict() va déballer : user_id, planned_start, planned_end...
     # Comme les noms sont IDENTIQUES dans models et schemas, ça marche direct.
-    db_shift = models.Shift(**shift.dict())
+    db_shift = models.Shift(
+        **shift.dict(),
+        establishment_id=user.establishment_id,
+        # Durées et coût calculés UNE fois ici (l'employé est déjà chargé)
+        **rota.shift_totals(
+            shift.type, shift.planned_start, shift.planned_end, shift.break_duration, shift.break_paid, user.hourly_rate,
+            shift.break_type, shift.break_times,
+        ),
+    )
     
     db.add(db_shift)
     db.commit()
@@ -230,23 +493,143 @@ def create_shift(shift: schemas.ShiftCreate, db: Session = Depends(get_db)):
     
     return db_shift
 
+# Plafond d'un lot de shifts (POST /shifts/bulk, /shifts/validate, application de modèles) :
+# une seule requête ne doit pas pouvoir fabriquer des millions de lignes en mémoire et dans un INSERT.
+SHIFT_BATCH_MAX_ROWS = 10_000
+
+def check_shift_batch_size(count: int):
+    if count > SHIFT_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"{SHIFT_BATCH_MAX_ROWS} shifts maximum par lot")
+
+def bulk_insert_shifts(db: Session, rows: List[dict]) -> List[models.Shift]:
+    # Un seul INSERT groupé (+ le journal des modifs), un seul commit
+    if not rows:
+        return []
+    # Durées et coût : les taux horaires de tous les employés en UNE requête
+    user_ids = {row["user_id"] for row in rows}
+    rate_of = dict(db.query(models.User.id, models.User.hourly_rate).filter(models.User.id.in_(user_ids)).all())
+    for row in rows:
+        row.update(rota.shift_totals(
+            row.get("type"), row["planned_start"], row["planned_end"],
+            row.get("break_duration"), row.get("break_paid"), rate_of.get(row["user_id"]),
+            row.get("break_type"), row.get("break_times"),
+        ))
+    new_shifts = db.execute(insert(models.Shift).returning(models.Shift), rows).scalars().all()
+    ids = [shift.id for shift in new_shifts]
+    models.log_shift_changes(db.connection(), new_shifts, "created")
+    db.commit()
+    # On recharge tout d'un coup (et pas un refresh par shift)
+    return db.query(models.Shift).filter(models.Shift.id.in_(ids)).order_by(models.Shift.id).all()
+
+# 1 bis. CRÉER EN MASSE (Une seule transaction)
+@router.post("/shifts/bulk", response_model=schemas.ShiftBulkResponse)
+def create_shifts_bulk(shifts: List[schemas.ShiftCreate], db: Session = Depends(get_db)):
+    check_shift_batch_size(len(shifts))
+    # 1. On vérifie TOUS les user_id en une seule requête (et on récupère leur établissement)
+    user_ids = {shift.user_id for shift in shifts}
+    establishment_of = {
+        row.id: row.establishment_id
+        for row in db.query(models.User.id, models.User.establishment_id).filter(models.User.id.in_(user_ids))
+    } if user_ids else {}
+
+    # 2. On prépare les lignes valides, et on note les erreurs élément par élément
+    candidates = [] # (index d'origine, shift)
+    errors = []
+    for index, shift in enumerate(shifts):
+        if shift.user_id not in establishment_of:
+            errors.append(schemas.ShiftBulkError(index=index, detail="Utilisateur introuvable"))
+            continue
+        try:
+            check_shift_interval(shift.planned_start, shift.planned_end)
+        except HTTPException as e:
+            errors.append(schemas.ShiftBulkError(index=index, detail=e.detail))
+            continue
+        candidates.append((index, shift))
+
+    # 3. Chevauchements (avec la base ou entre eux) : vérifiés en une passe
+    conflicts = find_batch_conflicts(db, [(s.user_id, s.planned_start, s.planned_end) for _, s in candidates])
+    rows = []
+    for position, (index, shift) in enumerate(candidates):
+        if position in conflicts:
+            errors.append(schemas.ShiftBulkError(
+                index=index,
+                detail="Chevauchement avec un autre shift",
+                conflicting_shift_ids=sorted(conflicts[position]["shift_ids"]),
+                # Index dans la liste envoyée (pas dans les candidats), comme /shifts/validate
+                conflicting_indexes=sorted(candidates[other][0] for other in conflicts[position]["indexes"]),
+            ))
+            continue
+        rows.append({**shift.dict(), "establishment_id": establishment_of[shift.user_id]})
+    errors.sort(key=lambda error: error.index)
+
+    # 4. Un seul INSERT groupé, un seul commit
+    return {"created": bulk_insert_shifts(db, rows), "errors": errors}
+
 # 2. MODIFIER (PUT)
-@app.put("/shifts/{shift_id}", response_model=schemas.ShiftResponse)
+# Les champs dont dépendent worked_minutes / paid_minutes / cost_cents
+TOTALS_FIELDS = {"planned_start", "planned_end", "break_type", "break_duration", "break_times", "break_paid", "type"}
+
+@router.put("/shifts/{shift_id}", response_model=schemas.ShiftResponse)
 def update_shift(shift_id: int, shift_update: schemas.ShiftUpdate, db: Session = Depends(get_db)):
     db_shift = db.query(models.Shift).filter(models.Shift.id == shift_id).first()
     if not db_shift:
         raise HTTPException(status_code=404, detail="Shift introuvable")
     
     update_data = shift_update.dict(exclude_unset=True)
+
+    # Si les horaires bougent : on revérifie les chevauchements (en s'excluant soi-même)
+    if "planned_start" in update_data or "planned_end" in update_data:
+        new_start = update_data.get("planned_start") or db_shift.planned_start
+        new_end = update_data.get("planned_end") or db_shift.planned_end
+        check_shift_interval(new_start, new_end)
+        raise_if_conflicts(conflicting_shift_ids(db, db_shift.user_id, new_start, new_end, exclude_id=db_shift.id))
+
     for key, value in update_data.items():
         setattr(db_shift, key, value)
+
+    # Horaires, pause ou type modifiés : on recalcule les totaux du shift
+    if TOTALS_FIELDS.intersection(update_data):
+        rate = db.query(models.User.hourly_rate).filter(models.User.id == db_shift.user_id).scalar()
+        totals = rota.shift_totals(
+            db_shift.type, db_shift.planned_start, db_shift.planned_end,
+            db_shift.break_duration, db_shift.break_paid, rate,
+            db_shift.break_type, db_shift.break_times,
+        )
+        for key, value in totals.items():
+            setattr(db_shift, key, value)
     
     db.commit()
     db.refresh(db_shift)
     return db_shift
 
+# 2 bis. VÉRIFIER UN LOT (sans rien enregistrer)
+@router.post("/shifts/validate", response_model=schemas.ShiftValidationResponse)
+def validate_shifts(shifts: List[schemas.ShiftCreate], db: Session = Depends(get_db)):
+    check_shift_batch_size(len(shifts))
+    errors = []
+    candidates = []
+    for index, shift in enumerate(shifts):
+        try:
+            check_shift_interval(shift.planned_start, shift.planned_end)
+        except HTTPException as e:
+            errors.append(schemas.ShiftBulkError(index=index, detail=e.detail))
+            continue
+        candidates.append((index, shift))
+
+    conflicts = find_batch_conflicts(db, [(s.user_id, s.planned_start, s.planned_end) for _, s in candidates])
+    results = []
+    for position, (index, _) in enumerate(candidates):
+        if position in conflicts:
+            results.append(schemas.ShiftConflict(
+                index=index,
+                conflicting_shift_ids=sorted(conflicts[position]["shift_ids"]),
+                # On renvoie les index de la liste envoyée (pas ceux des candidats)
+                conflicting_indexes=sorted(candidates[other][0] for other in conflicts[position]["indexes"]),
+            ))
+    return {"valid": not errors and not results, "conflicts": results, "errors": errors}
+
 # 3. SUPPRIMER (DELETE)
-@app.delete("/shifts/{shift_id}")
+@router.delete("/shifts/{shift_id}")
 def delete_shift(shift_id: int, db: Session = Depends(get_db)):
     db_shift = db.query(models.Shift).filter(models.Shift.id == shift_id).first()
     if not db_shift:
@@ -256,40 +639,744 @@ def delete_shift(shift_id: int, db: Session = Depends(get_db)):
     db.commit()
     return {"message": "Shift supprimé"}
 
+# 3 bis. CE QUI A CHANGÉ DEPUIS UN CURSEUR (synchro incrémentale)
+SHIFT_CHANGES_PAGE_SIZE = 1000
+
+# Un id du journal est attribué à l'INSERT, pas au COMMIT : sur Postgres, deux écritures simultanées
+# peuvent devenir visibles dans le désordre (11 visible alors que 10 n'est pas encore commité).
+# Un client qui avancerait à 11 ne reverrait jamais le 10. Le curseur s'arrête donc avant le premier
+# "trou" RÉCENT de la séquence : un trou de moins de SHIFT_CHANGES_SETTLE_SECONDS peut être une
+# transaction encore en cours ; plus vieux, c'est un rollback (cet id ne reviendra jamais).
+# Seule limite : une transaction qui écrit dans le journal doit commiter dans ce délai.
+SHIFT_CHANGES_SETTLE_SECONDS = float(os.getenv("SHIFT_CHANGES_SETTLE_SECONDS", "60"))
+
+def current_shift_cursor(db: Session) -> int:
+    # Le plus grand id tel que TOUT ce qui est en dessous est visible (ou définitivement abandonné)
+    ShiftChange = models.ShiftChange
+    recent_ids = db.execute(
+        select(ShiftChange.id)
+        .where(ShiftChange.changed_at >= datetime.utcnow() - timedelta(seconds=SHIFT_CHANGES_SETTLE_SECONDS))
+        .order_by(ShiftChange.id)
+    ).scalars().all()
+    if not recent_ids:
+        return db.execute(select(func.max(ShiftChange.id))).scalar() or 0
+
+    cursor = db.execute(select(func.max(ShiftChange.id)).where(ShiftChange.id < recent_ids[0])).scalar() or 0
+    for change_id in recent_ids:
+        if change_id != cursor + 1:
+            break # Trou récent : peut-être une écriture pas encore commitée, on l'attend
+        cursor = change_id
+    return cursor
+
+@router.get("/shifts/changes", response_model=schemas.ShiftChangesResponse)
+def read_shift_changes(
+    since: int = 0,
+    establishment_id: Optional[int] = None,
+    limit: int = SHIFT_CHANGES_PAGE_SIZE,
+    db: Session = Depends(get_read_db)
+):
+    limit = max(1, min(limit, SHIFT_CHANGES_PAGE_SIZE))
+
+    # 1. Les événements du journal après le curseur (dans l'ordre), sans dépasser le point "sûr"
+    safe_cursor = current_shift_cursor(db)
+    if safe_cursor <= since:
+        return {"cursor": since, "has_more": False}
+    query = select(models.ShiftChange).where(models.ShiftChange.id > since, models.ShiftChange.id <= safe_cursor)
+    if establishment_id:
+        # L'établissement est noté dans le journal : pas de jointure sur users
+        query = query.where(models.ShiftChange.establishment_id == establishment_id)
+    changes = db.execute(query.order_by(models.ShiftChange.id).limit(limit)).scalars().all()
+    if not changes:
+        # Rien pour cet établissement jusqu'au point sûr : le client peut y avancer directement
+        return {"cursor": safe_cursor, "has_more": False}
+
+    # 2. Pour chaque shift, seul le DERNIER événement compte
+    last_op = {}
+    for change in changes:
+        last_op[change.shift_id] = change.op
+
+    # 3. On recharge l'état actuel des shifts encore vivants, en une seule requête
+    alive_ids = [shift_id for shift_id, op in last_op.items() if op != "deleted"]
+    upserted = db.execute(
+        select(models.Shift).where(models.Shift.id.in_(alive_ids)).order_by(models.Shift.id)
+    ).scalars().all() if alive_ids else []
+    found_ids = {shift.id for shift in upserted}
+    # Un shift introuvable a été supprimé entre-temps : c'est aussi une "pierre tombale"
+    deleted = [shift_id for shift_id in last_op if shift_id not in found_ids]
+
+    has_more = len(changes) == limit
+    return {
+        "cursor": changes[-1].id if has_more else safe_cursor,
+        "has_more": has_more,
+        "upserted": upserted,
+        "deleted": deleted,
+    }
+
 # 4. LIRE (GET) - Pour afficher le planning
-@app.get("/shifts", response_model=List[schemas.ShiftResponse])
-def read_shifts(establishment_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Shift)
+def shifts_query(establishment_id: Optional[int], start: Optional[datetime], end: Optional[datetime]):
+    query = select(models.Shift)
     if establishment_id:
-        # On fait une jointure pour filtrer par l'établissement de l'user
-        query = query.join(models.User).filter(models.User.establishment_id == establishment_id)
-    return query.all()
+        # Colonne du shift lui-même (index establishment_id, planned_start, id) : pas de jointure sur users
+        query = query.where(models.Shift.establishment_id == establishment_id)
+
+    # On ne renvoie que la semaine affichée (et pas des années d'historique)
+    if start:
+        query = query.where(models.Shift.planned_start >= start)
+    if end:
+        query = query.where(models.Shift.planned_start < end)
+    return query.order_by(models.Shift.planned_start, models.Shift.id)
 
-@app.post("/shift-templates", response_model=schemas.ShiftTemplateResponse)
+def shifts_page_query(establishment_id: Optional[int], start: Optional[datetime], end: Optional[datetime], cursor: Optional[str], limit: int):
+    # Curseur sur (planned_start, id) : "les shifts APRÈS le dernier qu'on a vu"
+    query = shifts_query(establishment_id, start, end)
+    after = decode_cursor(cursor)
+    if after:
+        try:
+            after_start = datetime.fromisoformat(after["start"])
+            after_id = int(after["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Curseur invalide")
+        query = query.where(or_(
+            models.Shift.planned_start > after_start,
+            and_(models.Shift.planned_start == after_start, models.Shift.id > after_id),
+        ))
+    return query.limit(limit + 1)
+
+def shift_cursor(row):
+    return {"start": row.planned_start.isoformat(), "id": row.id}
+
+def read_shifts(
+    establishment_id: Optional[int] = None,
+    start: Optional[datetime] = None, # Début de la fenêtre (inclus)
+    end: Optional[datetime] = None,   # Fin de la fenêtre (exclue)
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fast: bool = False, # Colonnes brutes + orjson, sans objets ORM ni Pydantic
+    db: Session = Depends(get_read_db)
+):
+    query = shifts_page_query(establishment_id, start, end, cursor, limit)
+    if fast:
+        return fast_page(db.execute(query.with_only_columns(*SHIFT_COLUMNS)).all(), limit, shift_cursor)
+    rows = db.execute(query).scalars().all()
+    return split_page(rows, limit, shift_cursor)
+
+async def read_shifts_async(
+    establishment_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fast: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    query = shifts_page_query(establishment_id, start, end, cursor, limit)
+    if fast:
+        result = await db.execute(query.with_only_columns(*SHIFT_COLUMNS))
+        return fast_page(result.all(), limit, shift_cursor)
+    result = await db.execute(query)
+    return split_page(result.scalars().all(), limit, shift_cursor)
+
+router.get("/shifts", response_model=schemas.ShiftPage)(read_shifts_async if USE_ASYNC_DB else read_shifts)
+
+@router.post("/shift-templates", response_model=schemas.ShiftTemplateResponse)
 def create_shift_template(template: schemas.ShiftTemplateCreate, db: Session = Depends(get_db)):
     db_template = models.ShiftTemplate(**template.dict())
     db.add(db_template)
     db.commit()
+    invalidate_templates(db_template.establishment_id)
     db.refresh(db_template)
     return db_template
 
-@app.get("/shift-templates", response_model=List[schemas.ShiftTemplateResponse])
-def read_shift_templates(establishment_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(models.ShiftTemplate)
+def shift_templates_query(establishment_id: Optional[int]):
+    query = select(models.ShiftTemplate)
     if establishment_id:
-        query = query.filter(models.ShiftTemplate.establishment_id == establishment_id)
-    return query.all()
+        query = query.where(models.ShiftTemplate.establishment_id == establishment_id)
+    return query
+
+# --- Cache des données de référence (modèles, établissements) : voir reference_cache.py ---
+def invalidate_templates(establishment_id: Optional[int]):
+    # Le cache de l'établissement ET celui de la liste complète (sans filtre)
+    reference_cache.invalidate(templates_namespace(establishment_id), templates_namespace(None))
 
-@app.delete("/shift-templates/{template_id}")
+def cached_response(request: Request, entry):
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control()}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    # Le JSON est déjà encodé : rien à revalider ni à resérialiser
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def templates_payload(rows):
+    return [schemas.ShiftTemplateResponse.model_validate(row, from_attributes=True).model_dump(mode="json") for row in rows]
+
+# En cas de "miss", on lit la base PRINCIPALE (et pas le réplica) : un réplica en retard
+# remettrait en cache l'ancienne version juste après une invalidation.
+def read_shift_templates(request: Request, establishment_id: Optional[int] = None, db: Session = Depends(get_db)):
+    key = reference_cache.key(templates_namespace(establishment_id))
+    entry = reference_cache.get(key)
+    if entry is None:
+        rows = db.execute(shift_templates_query(establishment_id)).scalars().all()
+        entry = reference_cache.set(key, templates_payload(rows))
+    return cached_response(request, entry)
+
+async def read_shift_templates_async(request: Request, establishment_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    key = reference_cache.key(templates_namespace(establishment_id))
+    entry = reference_cache.get(key)
+    if entry is None:
+        result = await db.execute(shift_templates_query(establishment_id))
+        entry = reference_cache.set(key, templates_payload(result.scalars().all()))
+    return cached_response(request, entry)
+
+router.get("/shift-templates", response_model=List[schemas.ShiftTemplateResponse])(
+    read_shift_templates_async if USE_ASYNC_DB else read_shift_templates
+)
+
+# Appliquer un (ou plusieurs) modèle(s) sur une période : génère les shifts côté serveur
+TEMPLATE_APPLY_MAX_DAYS = 366 # Un an au plus par appel
+
+def apply_templates(db: Session, template_ids: List[int], request: schemas.TemplateApplyRequest):
+    if request.end_date < request.start_date:
+        raise HTTPException(status_code=400, detail="La date de fin doit être après la date de début")
+    if (request.end_date - request.start_date).days >= TEMPLATE_APPLY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Période trop longue (max {TEMPLATE_APPLY_MAX_DAYS} jours)")
+
+    templates = db.query(models.ShiftTemplate).filter(models.ShiftTemplate.id.in_(template_ids)).all()
+    missing = set(template_ids) - {template.id for template in templates}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Modèle(s) introuvable(s) : {sorted(missing)}")
+
+    # Taille du lot AVANT de générer quoi que ce soit : au plus (jours compatibles x employés) par modèle
+    expected = sum(
+        len(rota.template_days(template, request.start_date, request.end_date)) for template in templates
+    ) * len(set(request.user_ids))
+    check_shift_batch_size(expected) # Même réponse (413) que /shifts/bulk
+
+    # On vérifie tous les employés en UNE requête
+    users = db.query(models.User.id, models.User.establishment_id).filter(
+        models.User.id.in_(request.user_ids)
+    ).all() if request.user_ids else []
+    establishment_of = {user.id: user.establishment_id for user in users}
+
+    rows = []
+    skipped = set()
+    for template in templates:
+        # Un modèle ne s'applique qu'aux employés de SON établissement
+        user_ids = [uid for uid in request.user_ids if establishment_of.get(uid) == template.establishment_id]
+        skipped.update(uid for uid in request.user_ids if establishment_of.get(uid) != template.establishment_id)
+        rows.extend(rota.expand_template(template, user_ids, request.start_date, request.end_date))
+    applied_ids = {row["user_id"] for row in rows}
+
+    # On n'insère pas les shifts qui chevaucheraient un shift existant (ou un autre shift généré)
+    conflicts = find_batch_conflicts(db, [(row["user_id"], row["planned_start"], row["planned_end"]) for row in rows])
+    rows = [row for index, row in enumerate(rows) if index not in conflicts]
+
+    created = bulk_insert_shifts(db, rows)
+    return {
+        "created_count": len(created),
+        "conflict_count": len(conflicts),
+        "skipped_user_ids": sorted(skipped - applied_ids),
+        "shifts": created,
+    }
+
+@router.post("/shift-templates/apply", response_model=schemas.TemplateApplyResponse)
+def apply_shift_templates(request: schemas.MultiTemplateApplyRequest, db: Session = Depends(get_db)):
+    return apply_templates(db, request.template_ids, request)
+
+@router.post("/shift-templates/{template_id}/apply", response_model=schemas.TemplateApplyResponse)
+def apply_shift_template(template_id: int, request: schemas.TemplateApplyRequest, db: Session = Depends(get_db)):
+    return apply_templates(db, [template_id], request)
+
+@router.delete("/shift-templates/{template_id}")
 def delete_shift_template(template_id: int, db: Session = Depends(get_db)):
     db_template = db.query(models.ShiftTemplate).filter(models.ShiftTemplate.id == template_id).first()
     if not db_template:
         raise HTTPException(status_code=404, detail="Modèle introuvable")
+    establishment_id = db_template.establishment_id
     db.delete(db_template)
     db.commit()
+    invalidate_templates(establishment_id)
     return {"message": "Supprimé"}
 
-@app.get("/establishments", response_model=List[schemas.EstablishmentResponse])
-def read_establishments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return db.query(models.Establishment).offset(skip).limit(limit).all()
+def establishments_query(cursor: Optional[str], limit: int):
+    query = select(models.Establishment)
+    after_id = decode_id_cursor(cursor)
+    if after_id:
+        query = query.where(models.Establishment.id > after_id)
+    return query.order_by(models.Establishment.id).limit(limit + 1)
+
+def establishments_payload(rows, limit: int):
+    page = split_page(rows, limit, id_cursor)
+    page["items"] = [schemas.EstablishmentResponse.model_validate(row, from_attributes=True).model_dump(mode="json") for row in page["items"]]
+    return page
+
+# Même cache que les modèles (une entrée par page), "miss" lu sur la base principale
+def read_establishments(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    key = reference_cache.key(ESTABLISHMENTS_NAMESPACE, cursor, limit)
+    entry = reference_cache.get(key)
+    if entry is None:
+        rows = db.execute(establishments_query(cursor, limit)).scalars().all()
+        entry = reference_cache.set(key, establishments_payload(rows, limit))
+    return cached_response(request, entry)
+
+async def read_establishments_async(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
+):
+    key = reference_cache.key(ESTABLISHMENTS_NAMESPACE, cursor, limit)
+    entry = reference_cache.get(key)
+    if entry is None:
+        result = await db.execute(establishments_query(cursor, limit))
+        entry = reference_cache.set(key, establishments_payload(result.scalars().all(), limit))
+    return cached_response(request, entry)
+
+router.get("/establishments", response_model=schemas.EstablishmentPage)(
+    read_establishments_async if USE_ASYNC_DB else read_establishments
+)
+
+# ==========================
+# 🗓️ PLANNING (Utilisateurs + shifts + modèles en UNE requête, avec ETag)
+# ==========================
+def planning_etag(db: Session, establishment_id: int, week_start: datetime, week_end: datetime) -> str:
+    # On ne lit que (id, version) : si rien n'a bougé, pas besoin de charger ni de sérialiser les lignes
+    user_versions = db.execute(
+        select(models.User.id, models.User.version)
+        .where(models.User.establishment_id == establishment_id)
+        .order_by(models.User.id)
+    ).all()
+    shift_versions = db.execute(
+        select(models.Shift.id, models.Shift.version)
+        .where(models.Shift.establishment_id == establishment_id)
+        .where(models.Shift.planned_start >= week_start, models.Shift.planned_start < week_end)
+        .order_by(models.Shift.id)
+    ).all()
+    template_versions = db.execute(
+        select(models.ShiftTemplate.id, models.ShiftTemplate.version)
+        .where(models.ShiftTemplate.establishment_id == establishment_id)
+        .order_by(models.ShiftTemplate.id)
+    ).all()
+    digest = hashlib.sha1(repr((
+        establishment_id, week_start.isoformat(),
+        [tuple(r) for r in user_versions],
+        [tuple(r) for r in shift_versions],
+        [tuple(r) for r in template_versions],
+    )).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+@router.get("/planning", response_model=schemas.PlanningResponse)
+def read_planning(
+    establishment_id: int,
+    week: date, # N'importe quel jour de la semaine voulue
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db)
+):
+    week_start = week - timedelta(days=week.weekday()) # On se cale sur le lundi
+    start = datetime.combine(week_start, datetime.min.time())
+    end = start + timedelta(days=7)
+
+    # 1. Le client a déjà cette version ? -> 304, rien à renvoyer
+    etag = planning_etag(db, establishment_id, start, end)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    # 2. Sinon on envoie tout d'un coup
+    response.headers.update(headers)
+    cursor = current_shift_cursor(db) # Lu AVANT les shifts : au pire on rejouera un changement en trop
+    users = db.execute(
+        select(models.User).where(models.User.establishment_id == establishment_id).order_by(models.User.id)
+    ).scalars().all()
+    return {
+        "establishment_id": establishment_id,
+        "week_start": week_start,
+        "cursor": cursor,
+        "users": users,
+        "shifts": db.execute(shifts_query(establishment_id, start, end)).scalars().all(),
+        "templates": db.execute(shift_templates_query(establishment_id)).scalars().all(),
+    }
+
+# ==========================
+# 🤖 REMPLISSAGE AUTOMATIQUE (affectation des modèles : couverture d'abord, puis coût, par heuristique)
+# ==========================
+AUTO_FILL_MAX_DAYS = 62 # Deux mois au plus par appel
+
+@router.post("/planning/auto-fill", response_model=schemas.AutoFillResponse)
+def auto_fill_planning(request: schemas.AutoFillRequest, db: Session = Depends(get_db)):
+    """Propose (ou enregistre) les shifts des modèles demandés. Heuristique : la couverture passe avant le coût,
+    et le coût obtenu est bon mais pas forcément le plus bas possible."""
+    if request.end_date < request.start_date:
+        raise HTTPException(status_code=400, detail="La date de fin doit être après la date de début")
+    if (request.end_date - request.start_date).days >= AUTO_FILL_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Période trop longue (max {AUTO_FILL_MAX_DAYS} jours)")
+    if any(requirement.count < 0 for requirement in request.requirements):
+        raise HTTPException(status_code=400, detail="Le nombre d'employés voulus ne peut pas être négatif")
+
+    # 1. Les modèles demandés (tous de cet établissement), en une requête
+    template_ids = {requirement.template_id for requirement in request.requirements}
+    templates = {
+        template.id: template
+        for template in db.query(models.ShiftTemplate).filter(
+            models.ShiftTemplate.id.in_(template_ids),
+            models.ShiftTemplate.establishment_id == request.establishment_id,
+        )
+    } if template_ids else {}
+    missing = template_ids - set(templates)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Modèle(s) introuvable(s) dans cet établissement : {sorted(missing)}")
+
+    # 2. Les créneaux à pourvoir : (modèle, jour) -> nombre d'employés
+    # Une exigence datée remplace celle "tous les jours" du même modèle
+    needed = {}
+    for requirement in sorted(request.requirements, key=lambda r: r.day is not None):
+        template = templates[requirement.template_id]
+        if requirement.day is not None:
+            if not request.start_date <= requirement.day <= request.end_date:
+                raise HTTPException(status_code=400, detail=f"Jour {requirement.day} hors de la période")
+            days = [requirement.day]
+        else:
+            days = rota.template_days(template, request.start_date, request.end_date)
+        for day in days:
+            needed[(template.id, day)] = requirement.count
+
+    # 3. L'équipe (taux horaires) et ce qu'elle a déjà : shifts et congés des semaines touchées
+    team_query = db.query(models.User.id, models.User.hourly_rate).filter(models.User.establishment_id == request.establishment_id)
+    if request.user_ids is not None:
+        team_query = team_query.filter(models.User.id.in_(request.user_ids))
+    hourly_rates = dict(team_query.all())
+    weekly_caps = {
+        user_id: round(request.weekly_hours.get(user_id, request.max_weekly_hours) * 60)
+        for user_id in hourly_rates
+    }
+
+    first_monday = datetime.combine(request.start_date - timedelta(days=request.start_date.weekday()), datetime.min.time())
+    after_last_week = datetime.combine(request.end_date + timedelta(days=7 - request.end_date.weekday()), datetime.min.time())
+    existing = db.execute(
+        select(
+            models.Shift.user_id, models.Shift.planned_start, models.Shift.planned_end, models.Shift.type,
+            models.Shift.position, models.Shift.worked_minutes,
+            models.Shift.break_type, models.Shift.break_duration, models.Shift.break_times, models.Shift.break_paid,
+        ).where(
+            models.Shift.user_id.in_(hourly_rates),
+            models.Shift.planned_start < after_last_week,
+            models.Shift.planned_start > first_monday - MAX_SHIFT_DURATION,
+        )
+    ).all() if hourly_rates else []
+    busy = []
+    for row in existing:
+        worked = row.worked_minutes
+        if worked is None: # Ancien shift pas encore passé par le backfill
+            worked = rota.shift_totals(
+                row.type, row.planned_start, row.planned_end, row.break_duration, row.break_paid, 0, row.break_type, row.break_times,
+            )["worked_minutes"]
+        if row.type in (None, "work"):
+            busy.append((row.user_id, row.planned_start, row.planned_end, worked))
+        else:
+            # Congé, maladie... : toute la journée est prise, pas seulement les heures notées
+            day_start, day_end = rota.whole_days(row.planned_start, row.planned_end)
+            busy.append((row.user_id, day_start, day_end, worked))
+
+    # 4. Les créneaux encore à pourvoir : un shift déjà posé sur le créneau (mêmes horaires, même poste) compte,
+    # quel que soit l'employé de l'établissement (même hors de user_ids)
+    placed = db.execute(
+        select(models.Shift.planned_start, models.Shift.planned_end, models.Shift.position).where(
+            models.Shift.establishment_id == request.establishment_id,
+            or_(models.Shift.type == "work", models.Shift.type.is_(None)),
+            models.Shift.planned_start >= datetime.combine(request.start_date, datetime.min.time()),
+            models.Shift.planned_start < datetime.combine(request.end_date + timedelta(days=1), datetime.min.time()),
+        )
+    ).all()
+    already = Counter((row.planned_start, row.planned_end, row.position) for row in placed)
+    slots = []
+    for (template_id, day), count in needed.items():
+        template = templates[template_id]
+        start, end = rota.template_hours(template, day)
+        worked, paid = rota.shift_minutes(start, end, template.break_duration, template.break_paid, template.break_type, template.break_times)
+        count = max(0, count - already[(start, end, template.position)])
+        if count:
+            slots.append({"template": template, "day": day, "start": start, "end": end, "needed": count, "worked_minutes": worked, "paid_minutes": paid})
+
+    # 5. Le calcul lui-même (rota.auto_fill : sans base, sans FastAPI)
+    # Heuristique (glouton + réparation) : un bon planning, pas forcément le moins cher possible
+    assignments, unfilled = rota.auto_fill(slots, hourly_rates, busy, weekly_caps)
+
+    # 6. L'aperçu, dans l'ordre du planning
+    rows = []
+    preview = []
+    for index, user_id in sorted(assignments, key=lambda a: (slots[a[0]]["start"], a[1])):
+        slot = slots[index]
+        row = rota.template_shift(slot["template"], user_id, slot["start"], slot["end"])
+        totals = rota.shift_totals(
+            "work", slot["start"], slot["end"], row["break_duration"], row["break_paid"], hourly_rates[user_id],
+            row["break_type"], row["break_times"],
+        )
+        rows.append(row)
+        preview.append({**row, **totals, "template_id": slot["template"].id})
+    response = {
+        "committed": False,
+        "total_cost_cents": sum(shift["cost_cents"] for shift in preview),
+        "total_paid_minutes": sum(shift["paid_minutes"] for shift in preview),
+        "shifts": preview,
+        "unfilled": sorted(
+            [
+                {"template_id": slots[index]["template"].id, "day": slots[index]["day"], "needed": slots[index]["needed"], "missing": count}
+                for index, count in unfilled.items()
+            ],
+            key=lambda gap: (gap["day"], gap["template_id"]),
+        ),
+    }
+
+    # 7. Validation directe : un seul INSERT groupé, un seul commit
+    # (sinon le client peut renvoyer "shifts" tel quel à POST /shifts/bulk)
+    if request.commit:
+        response["created"] = bulk_insert_shifts(db, rows)
+        response["committed"] = True
+    return response
+
+# ==========================
+# 📊 STATISTIQUES (Heures & coût calculés par la base)
+# ==========================
+@router.get("/stats/labour", response_model=schemas.LabourStatsResponse)
+def read_labour_stats(
+    start: datetime,
+    end: datetime,
+    establishment_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    Shift = models.Shift
+    day = func.date(Shift.planned_start)
+
+    # Un seul GROUP BY (employé, jour) sur les colonnes précalculées : de simples SUM,
+    # sans jointure sur users ni recalcul des durées / pauses ligne par ligne
+    query = (
+        db.query(
+            Shift.user_id,
+            day.label("day"),
+            func.sum(Shift.worked_minutes).label("worked_minutes"),
+            func.sum(Shift.break_minutes).label("break_minutes"), # Pauses fixes (break_times) comprises
+            func.sum(Shift.paid_minutes).label("paid_minutes"),
+            func.sum(Shift.cost_cents).label("cost_cents"),
+        )
+        .filter(Shift.type == "work") # Les congés ne comptent pas dans les heures
+        .filter(Shift.planned_start >= start, Shift.planned_start < end)
+    )
+    if establishment_id:
+        query = query.filter(Shift.establishment_id == establishment_id)
+    rows = query.group_by(Shift.user_id, day).order_by(Shift.user_id, day).all()
+
+    # On regroupe les lignes (employé, jour) par employé
+    users = {}
+    for row in rows:
+        day_cost = (row.cost_cents or 0) / 100
+        stats = users.setdefault(row.user_id, schemas.LabourUserStats(
+            user_id=row.user_id, worked_minutes=0, break_minutes=0, paid_minutes=0, cost=0
+        ))
+        stats.worked_minutes += row.worked_minutes or 0
+        stats.break_minutes += row.break_minutes or 0
+        stats.paid_minutes += row.paid_minutes or 0
+        stats.cost = round(stats.cost + day_cost, 2)
+        stats.days.append(schemas.LabourDayStats(
+            day=row.day,
+            worked_minutes=row.worked_minutes or 0,
+            paid_minutes=row.paid_minutes or 0,
+            cost=day_cost,
+        ))
+
+    return schemas.LabourStatsResponse(
+        start=start,
+        end=end,
+        total_worked_minutes=sum(u.worked_minutes for u in users.values()),
+        total_paid_minutes=sum(u.paid_minutes for u in users.values()),
+        total_cost=round(sum(u.cost for u in users.values()), 2),
+        users=list(users.values()),
+    )
+
+@router.get("/stats/db-pool")
+def read_db_pool_stats():
+    # Connexions prêtées, overflow, temps d'attente : pour dimensionner DB_POOL_SIZE / DB_MAX_OVERFLOW
+    return pool_stats()
+
+@router.get("/metrics")
+def read_metrics():
+    # Format texte Prometheus (à scraper)
+    content = metrics.render_prometheus(pool_stats(), {"auth": auth.principal_cache.stats(), "reference": reference_cache.stats()})
+    return Response(content=content, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ==========================
+# 📤 EXPORT PAIE (CSV / NDJSON en streaming)
+# ==========================
+EXPORT_BATCH_SIZE = 1000 # Lignes lues (et envoyées) à la fois : la mémoire reste plate
+EXPORT_COLUMNS = [
+    "shift_id", "user_id", "full_name", "email", "establishment_id",
+    "planned_start", "planned_end", "type", "position", "quantity",
+    "break_duration", "break_paid", "hourly_rate",
+    "worked_minutes", "paid_minutes", "break_minutes", "cost",
+]
+
+def timesheet_rows(session_factory, start: datetime, end: datetime, establishment_id: Optional[int]):
+    # Session à part : la réponse est envoyée APRÈS la fin de la route (et donc de get_db)
+    db = session_factory()
+    try:
+        query = (
+            select(
+                models.Shift.id.label("shift_id"), models.Shift.user_id,
+                models.User.full_name, models.User.email, models.Shift.establishment_id,
+                models.Shift.planned_start, models.Shift.planned_end,
+                models.Shift.type, models.Shift.position, models.Shift.quantity,
+                models.Shift.break_duration, models.Shift.break_paid, models.User.hourly_rate,
+                models.Shift.worked_minutes, models.Shift.paid_minutes, models.Shift.break_minutes, models.Shift.cost_cents,
+            )
+            .join(models.User, models.User.id == models.Shift.user_id)
+            .where(models.Shift.planned_start >= start, models.Shift.planned_start < end)
+            .order_by(models.Shift.planned_start, models.Shift.id)
+        )
+        if establishment_id:
+            query = query.where(models.Shift.establishment_id == establishment_id)
+
+        # Curseur côté serveur : la base envoie les lignes par paquets au lieu de tout d'un coup
+        result = db.execute(query.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE))
+        for batch in result.partitions():
+            rows = []
+            for row in batch:
+                rate = row.hourly_rate or 0
+                rows.append({
+                    "shift_id": row.shift_id,
+                    "user_id": row.user_id,
+                    "full_name": row.full_name,
+                    "email": row.email,
+                    "establishment_id": row.establishment_id,
+                    "planned_start": row.planned_start.isoformat(),
+                    "planned_end": row.planned_end.isoformat(),
+                    "type": row.type,
+                    "position": row.position,
+                    "quantity": row.quantity,
+                    "break_duration": row.break_duration or 0,
+                    "break_paid": bool(row.break_paid),
+                    "hourly_rate": rate,
+                    # Précalculés à l'écriture (les congés valent 0)
+                    "worked_minutes": row.worked_minutes,
+                    "paid_minutes": row.paid_minutes,
+                    "break_minutes": row.break_minutes, # Pauses réelles (break_duration vaut 0 si pause "rigid")
+                    "cost": row.cost_cents / 100 if row.cost_cents is not None else None,
+                })
+            yield rows
+    finally:
+        db.close()
+
+def timesheet_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    yield buffer.getvalue()
+
+def timesheet_ndjson(batches):
+    for rows in batches:
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+@router.get("/exports/timesheets")
+def export_timesheets(
+    request: Request,
+    start: datetime,
+    end: datetime,
+    establishment_id: Optional[int] = None, # Vide = tous les établissements
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    current_user: models.User = Depends(auth.get_current_user) # Noms, emails et taux horaires : rien sans connexion
+):
+    # --- SÉCURITÉ ---
+    # Admin : tous les établissements. Manager : le sien uniquement. Employé : jamais.
+    if current_user.role == models.UserRole.EMPLOYEE:
+        raise HTTPException(status_code=403, detail="Interdit aux employés")
+    if current_user.role == models.UserRole.MANAGER:
+        if establishment_id is not None and establishment_id != current_user.establishment_id:
+            raise HTTPException(status_code=403, detail="Export limité à votre établissement")
+        establishment_id = current_user.establishment_id
+
+    batches = timesheet_rows(read_session_factory(request), start, end, establishment_id) # Réplica si configuré
+    filename = f"timesheets_{start.date().isoformat()}_{end.date().isoformat()}.{export_format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if export_format == "ndjson":
+        return StreamingResponse(timesheet_ndjson(batches), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(timesheet_csv(batches), media_type="text/csv; charset=utf-8", headers=headers)
+
+# ==========================
+# 🚀 APPLICATION
+# ==========================
+logger = logging.getLogger("planning")
+
+# Les tables sont gérées par les migrations Alembic ("alembic upgrade head"), plus par create_all.
+# Au démarrage on vérifie seulement que la base est à la dernière révision :
+# SCHEMA_CHECK=strict (défaut) refuse de démarrer, warn se contente d'un avertissement, off ne vérifie rien.
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict").lower()
+
+def check_schema():
+    try:
+        current, heads = schema_revisions()
+    except Exception as exc:
+        if SCHEMA_CHECK == "strict":
+            raise
+        logger.warning("Vérification du schéma impossible : %s", exc)
+        return
+    if current != heads:
+        message = (
+            f"La base n'est pas à jour (révision {', '.join(sorted(current)) or 'aucune'}, "
+            f"attendu {', '.join(sorted(heads))}) : lancez 'alembic upgrade head' depuis backend-planning/"
+        )
+        if SCHEMA_CHECK == "strict":
+            raise RuntimeError(message)
+        logger.warning(message)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SCHEMA_CHECK != "off":
+        await run_in_threadpool(check_schema)
+    # Envoi des invitations en tâche de fond (INVITATION_WORKER=0 pour le couper)
+    worker = asyncio.create_task(invitations.run_worker(SessionLocal)) if invitations.INVITATION_WORKER else None
+    yield
+    if worker is not None:
+        worker.cancel()
+        with suppress(asyncio.CancelledError):
+            await worker
+
+def create_app() -> FastAPI:
+    # Rien ne se connecte à la base ici : la 1re connexion est ouverte par la vérification
+    # du schéma au démarrage (ou par la 1re requête). Importer main.py ne demande donc pas de base.
+    application = FastAPI(title="Planning SaaS API", lifespan=lifespan)
+
+    # Configuration CORS (Pour que le Front puisse parler au Back)
+    origins = ["http://localhost:5173", "http://localhost:3000"]
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[replica.PRIMARY_PIN_HEADER], # Le front doit pouvoir le lire pour le renvoyer
+    )
+
+    # Réplica de lecture : après une écriture, le client reste quelques secondes sur la base principale
+    if REPLICA_DATABASE_URL:
+        application.add_middleware(replica.PrimaryPinMiddleware)
+
+    # Mesures par route (latence, nombre de requêtes SQL, temps en base) -> /metrics
+    application.add_middleware(metrics.MetricsMiddleware)
+
+    application.include_router(router)
+    return application
 
+app = create_app()
@@ -0,0 +1,188 @@
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+
+# Instrumentation par requête : latence par route, nombre de requêtes SQL, temps passé en base.
+# Tout est exposé au format texte Prometheus sur /metrics (sans dépendance externe).
+
+logger = logging.getLogger("planning.metrics")
+
+# Au-delà de ce nombre de requêtes SQL dans UNE requête HTTP, on soupçonne un N+1
+SQL_QUERY_WARN_THRESHOLD = int(os.getenv("SQL_QUERY_WARN_THRESHOLD", "20"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {} # valeurs des labels -> [compteurs par bucket, somme, total]
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: tuple, value: float):
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, (counts, total, count) in sorted(self._series.items()):
+                labels = format_labels(self.labels, label_values)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: tuple, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{format_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def format_labels(names, values):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Durée des requêtes HTTP par route", ("method", "route"), LATENCY_BUCKETS
+)
+REQUESTS_TOTAL = Counter("http_requests_total", "Requêtes HTTP par route et statut", ("method", "route", "status"))
+SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "Nombre de requêtes SQL par requête HTTP", ("method", "route"), QUERY_COUNT_BUCKETS
+)
+SQL_TIME = Counter("http_request_db_seconds_total", "Temps total passé en base par route", ("method", "route"))
+SQL_WARNINGS = Counter(
+    "http_request_sql_threshold_exceeded_total", "Requêtes HTTP au-delà du seuil de requêtes SQL (N+1 ?)", ("method", "route")
+)
+
+
+# --- Compteurs de la requête HTTP en cours ---
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+
+# Le même objet est vu par la route, même quand elle tourne dans un thread (contexte copié)
+current_request: ContextVar = ContextVar("current_request", default=None)
+
+
+def record_statement(started):
+    stats = current_request.get()
+    if stats is not None and started is not None:
+        stats.statements += 1
+        stats.db_time += time.perf_counter() - started
+
+def instrument_engine(engine):
+    # Branche les events SQLAlchemy sur un moteur (sync, ou async_engine.sync_engine)
+    # L'heure de début est rangée sur le "context" de CETTE exécution (et pas sur la connexion,
+    # qui vit longtemps dans le pool) : rien ne s'accumule si la requête SQL échoue.
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_statement(getattr(context, "_metrics_started", None))
+
+    # Requête en erreur : pas d'after_cursor_execute, mais son temps en base compte quand même
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        record_statement(getattr(exception_context.execution_context, "_metrics_started", None))
+
+
+class MetricsMiddleware:
+    # Middleware ASGI "pur" : la route s'exécute dans le même contexte, donc voit current_request
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            # Le chemin "modèle" (/shifts/{shift_id}) et pas l'URL réelle : sinon une série par id
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            labels = (scope["method"], route_path)
+            REQUEST_LATENCY.observe(labels, elapsed)
+            REQUESTS_TOTAL.inc(labels + (str(status_code),))
+            SQL_STATEMENTS.observe(labels, stats.statements)
+            SQL_TIME.inc(labels, stats.db_time)
+            if stats.statements > SQL_QUERY_WARN_THRESHOLD:
+                SQL_WARNINGS.inc(labels)
+                logger.warning(
+                    "%s %s : %d requêtes SQL (seuil %d) en %.1f ms, dont %.1f ms en base — N+1 ?",
+                    scope["method"], route_path, stats.statements, SQL_QUERY_WARN_THRESHOLD,
+                    elapsed * 1000, stats.db_time * 1000,
+                )
+
+
+def gauge_lines(name: str, help_text: str, values: dict, label: str):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{label}="{key}"}} {value}')
+    return lines
+
+
+def render_prometheus(pool_stats: dict, cache_stats: dict) -> str:
+    lines = []
+    for metric in (REQUEST_LATENCY, REQUESTS_TOTAL, SQL_STATEMENTS, SQL_TIME, SQL_WARNINGS):
+        lines += metric.render()
+    # Pool de connexions (voir pool_metrics.py)
+    for field in ("checked_out", "overflow", "idle", "pool_size", "checkouts", "connects", "timeouts", "wait_total_seconds"):
+        values = {engine_name: stats[field] for engine_name, stats in pool_stats.items() if field in stats}
+        if values:
+            lines += gauge_lines(f"db_pool_{field}", f"Pool de connexions : {field}", values, "engine")
+    # Caches en mémoire (hits / misses)
+    for field in ("hits", "misses", "size"):
+        values = {cache_name: stats[field] for cache_name, stats in cache_stats.items()}
+        if values:
+            lines += gauge_lines(f"cache_{field}", f"Cache en mémoire : {field}", values, "cache")
+    return "\n".join(lines) + "\n"
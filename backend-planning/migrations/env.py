@@ -0,0 +1,48 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from database import require_database_url
+import models
+
+# Configuration Alembic (alembic.ini) et logs
+config = context.config
+# Connexion fournie par le code appelant (database.upgrade_to_head) : on ne touche pas à ses logs
+provided_connection = config.attributes.get("connection")
+if config.config_file_name is not None and provided_connection is None:
+    fileConfig(config.config_file_name)
+
+# Les tables "attendues" : celles déclarées dans models.py (sert à --autogenerate)
+target_metadata = models.Base.metadata
+
+def configure_options():
+    return {
+        "target_metadata": target_metadata,
+        "compare_type": True,
+        # SQLite ne sait pas faire ALTER COLUMN : Alembic recopie la table ("batch mode")
+        "render_as_batch": True,
+    }
+
+def run_migrations_offline():
+    # "alembic upgrade head --sql" : génère le SQL sans se connecter
+    context.configure(url=require_database_url(), literal_binds=True, **configure_options())
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    if provided_connection is not None:
+        context.configure(connection=provided_connection, **configure_options())
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
+    # Une connexion dédiée (sans pool) : les migrations ne passent pas par le pool de l'application
+    connectable = create_engine(require_database_url(), poolclass=pool.NullPool)
+    with connectable.connect() as connection:
+        context.configure(connection=connection, **configure_options())
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,91 @@
+"""Schéma initial (tel que créé par l'ancien create_all)
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001_initial"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "establishments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("address", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_establishments_id", "establishments", ["id"])
+    op.create_index("ix_establishments_name", "establishments", ["name"])
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=True),
+        sa.Column("hashed_password", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("role", sa.Enum("ADMIN", "MANAGER", "EMPLOYEE", name="userrole"), nullable=True),
+        sa.Column("hourly_rate", sa.Float(), nullable=True),
+        sa.Column("establishment_id", sa.Integer(), nullable=True),
+        sa.Column("manager_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["establishment_id"], ["establishments.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_id", "users", ["id"])
+
+    op.create_table(
+        "shifts",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("planned_start", sa.String(), nullable=True),
+        sa.Column("planned_end", sa.String(), nullable=True),
+        sa.Column("position", sa.String(), nullable=True),
+        sa.Column("type", sa.String(), nullable=True),
+        sa.Column("quantity", sa.Float(), nullable=True),
+        sa.Column("break_type", sa.String(), nullable=True),
+        sa.Column("break_duration", sa.Integer(), nullable=True),
+        sa.Column("break_times", sa.JSON(), nullable=True),
+        sa.Column("break_paid", sa.Boolean(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_shifts_id", "shifts", ["id"])
+
+    op.create_table(
+        "shift_templates",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("start_time", sa.String(), nullable=True),
+        sa.Column("end_time", sa.String(), nullable=True),
+        sa.Column("position", sa.String(), nullable=True),
+        sa.Column("applicable_days", sa.JSON(), nullable=True),
+        sa.Column("break_type", sa.String(), nullable=True),
+        sa.Column("break_duration", sa.Integer(), nullable=True),
+        sa.Column("break_times", sa.JSON(), nullable=True),
+        sa.Column("break_paid", sa.Boolean(), nullable=True),
+        sa.Column("establishment_id", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(["establishment_id"], ["establishments.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_shift_templates_id", "shift_templates", ["id"])
+
+
+def downgrade():
+    op.drop_index("ix_shift_templates_id", table_name="shift_templates")
+    op.drop_table("shift_templates")
+    op.drop_index("ix_shifts_id", table_name="shifts")
+    op.drop_table("shifts")
+    op.drop_index("ix_users_id", table_name="users")
+    op.drop_index("ix_users_email", table_name="users")
+    op.drop_table("users")
+    op.drop_index("ix_establishments_name", table_name="establishments")
+    op.drop_index("ix_establishments_id", table_name="establishments")
+    op.drop_table("establishments")
+    sa.Enum(name="userrole").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,75 @@
+"""Dates en DateTime, versions (ETag), journal shift_changes et index des requêtes fréquentes
+
+Revision ID: 0002_planning_performance
+Revises: 0001_initial
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_planning_performance"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # --- Shifts : String -> DateTime (Postgres convertit les textes ISO avec USING) ---
+    with op.batch_alter_table("shifts") as batch:
+        batch.alter_column(
+            "planned_start", existing_type=sa.String(), type_=sa.DateTime(), nullable=False,
+            postgresql_using="planned_start::timestamp",
+        )
+        batch.alter_column(
+            "planned_end", existing_type=sa.String(), type_=sa.DateTime(), nullable=False,
+            postgresql_using="planned_end::timestamp",
+        )
+        batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    # "les shifts de cet employé sur cette semaine" et pagination par curseur (planned_start, id)
+    op.create_index("ix_shifts_user_id_planned_start", "shifts", ["user_id", "planned_start"])
+    op.create_index("ix_shifts_planned_start_id", "shifts", ["planned_start", "id"])
+
+    # --- Versions (optimistic locking + ETag du planning) ---
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    with op.batch_alter_table("shift_templates") as batch:
+        batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    # --- Index sur les clés étrangères filtrées à chaque requête (équipe / modèles d'un établissement) ---
+    op.create_index("ix_users_establishment_id", "users", ["establishment_id"])
+    op.create_index("ix_shift_templates_establishment_id", "shift_templates", ["establishment_id"])
+
+    # --- Journal des modifications (GET /shifts/changes) ---
+    op.create_table(
+        "shift_changes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("shift_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("op", sa.String(), nullable=False),
+        sa.Column("changed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_shift_changes_id", "shift_changes", ["id"])
+    op.create_index("ix_shift_changes_shift_id", "shift_changes", ["shift_id"])
+    op.create_index("ix_shift_changes_changed_at", "shift_changes", ["changed_at"])
+
+
+def downgrade():
+    op.drop_index("ix_shift_changes_changed_at", table_name="shift_changes")
+    op.drop_index("ix_shift_changes_shift_id", table_name="shift_changes")
+    op.drop_index("ix_shift_changes_id", table_name="shift_changes")
+    op.drop_table("shift_changes")
+
+    op.drop_index("ix_shift_templates_establishment_id", table_name="shift_templates")
+    op.drop_index("ix_users_establishment_id", table_name="users")
+    with op.batch_alter_table("shift_templates") as batch:
+        batch.drop_column("version")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("version")
+
+    op.drop_index("ix_shifts_planned_start_id", table_name="shifts")
+    op.drop_index("ix_shifts_user_id_planned_start", table_name="shifts")
+    with op.batch_alter_table("shifts") as batch:
+        batch.drop_column("version")
+        batch.alter_column("planned_end", existing_type=sa.DateTime(), type_=sa.String(), nullable=True)
+        batch.alter_column("planned_start", existing_type=sa.DateTime(), type_=sa.String(), nullable=True)
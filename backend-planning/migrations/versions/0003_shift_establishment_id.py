@@ -0,0 +1,46 @@
+"""Établissement dénormalisé sur les shifts et le journal shift_changes (planning et synchro sans jointure sur users)
+
+Revision ID: 0003_shift_establishment_id
+Revises: 0002_planning_performance
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_shift_establishment_id"
+down_revision = "0002_planning_performance"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("shifts") as batch:
+        batch.add_column(sa.Column("establishment_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_shifts_establishment_id", "establishments", ["establishment_id"], ["id"])
+
+    # Backfill : chaque shift prend l'établissement ACTUEL de son employé
+    # (c'est ce que renvoyait la jointure sur users jusqu'ici). Une seule requête, côté base.
+    op.execute(
+        "UPDATE shifts SET establishment_id = "
+        "(SELECT users.establishment_id FROM users WHERE users.id = shifts.user_id)"
+    )
+
+    # Après le backfill : construire l'index une fois, plutôt que de le mettre à jour ligne par ligne
+    op.create_index(
+        "ix_shifts_establishment_id_planned_start", "shifts", ["establishment_id", "planned_start", "id"]
+    )
+
+    # Le journal note l'établissement du shift au moment de l'événement (synchro par établissement)
+    with op.batch_alter_table("shift_changes") as batch:
+        batch.add_column(sa.Column("establishment_id", sa.Integer(), nullable=True))
+    op.create_index("ix_shift_changes_establishment_id_id", "shift_changes", ["establishment_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_shift_changes_establishment_id_id", table_name="shift_changes")
+    with op.batch_alter_table("shift_changes") as batch:
+        batch.drop_column("establishment_id")
+    op.drop_index("ix_shifts_establishment_id_planned_start", table_name="shifts")
+    with op.batch_alter_table("shifts") as batch:
+        batch.drop_constraint("fk_shifts_establishment_id", type_="foreignkey")
+        batch.drop_column("establishment_id")
@@ -0,0 +1,37 @@
+"""Outbox des invitations (envoyées par un worker, plus pendant la requête)
+
+Revision ID: 0004_invitation_outbox
+Revises: 0003_shift_establishment_id
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_invitation_outbox"
+down_revision = "0003_shift_establishment_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "invitation_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("sent_at", sa.DateTime(), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_invitation_outbox_id", "invitation_outbox", ["id"])
+    op.create_index("ix_invitation_outbox_sent_at_id", "invitation_outbox", ["sent_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_invitation_outbox_sent_at_id", table_name="invitation_outbox")
+    op.drop_index("ix_invitation_outbox_id", table_name="invitation_outbox")
+    op.drop_table("invitation_outbox")
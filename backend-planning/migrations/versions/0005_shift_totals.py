@@ -0,0 +1,32 @@
+"""Totaux précalculés sur les shifts (worked_minutes, paid_minutes, break_minutes, cost_cents)
+
+Les colonnes arrivent vides (NULL) : elles sont remplies ensuite, par paquets et sans
+bloquer la table, avec `python backfill_shift_totals.py`.
+
+Revision ID: 0005_shift_totals
+Revises: 0004_invitation_outbox
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_shift_totals"
+down_revision = "0004_invitation_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("shifts") as batch:
+        batch.add_column(sa.Column("worked_minutes", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("paid_minutes", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("break_minutes", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("cost_cents", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("shifts") as batch:
+        batch.drop_column("cost_cents")
+        batch.drop_column("break_minutes")
+        batch.drop_column("paid_minutes")
+        batch.drop_column("worked_minutes")
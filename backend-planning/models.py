@@ -1,6 +1,7 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Enum, DateTime, Float, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Enum, DateTime, Float, JSON, Index, event, select, update
+from sqlalchemy.orm import relationship, attributes
 from database import Base
+from datetime import datetime
 import enum
 
 class UserRole(str, enum.Enum):
@@ -25,8 +26,12 @@ class User(Base):
     full_name = Column(String)
     role = Column(Enum(UserRole), default=UserRole.EMPLOYEE)
     hourly_rate = Column(Float, default=11.5)
-    establishment_id = Column(Integer, ForeignKey("establishments.id"), nullable=True)
+    establishment_id = Column(Integer, ForeignKey("establishments.id"), nullable=True, index=True) # "l'équipe de cet établissement"
     manager_id = Column(Integer, nullable=True)
+
+    # Numéro de version : +1 automatiquement à chaque UPDATE (sert aux ETag du planning)
+    version = Column(Integer, nullable=False, default=1)
+    __mapper_args__ = {"version_id_col": version}
     
     establishment = relationship("Establishment", back_populates="users")
     
@@ -37,8 +42,9 @@ class Shift(Base):
     __tablename__ = "shifts"
 
     id = Column(Integer, primary_key=True, index=True)
-    planned_start = Column(String)
-    planned_end = Column(String)
+    # De vraies dates (et plus des String) : la base peut faire des recherches par plage
+    planned_start = Column(DateTime, nullable=False)
+    planned_end = Column(DateTime, nullable=False)
     position = Column(String)
     type = Column(String, default="work")
     quantity = Column(Float, nullable=True) # Pour les congés (ex: 1.0 jour)
@@ -48,10 +54,34 @@ class Shift(Base):
     break_duration = Column(Integer, default=0)     # Durée en minutes
     break_times = Column(JSON, nullable=True)       # Liste d'horaires [{"start":"12:00", "end":"12:30"}]
     break_paid = Column(Boolean, default=False)     # Payé ou non
+
+    # --- TOTAUX PRÉCALCULÉS (à l'écriture, voir rota.shift_totals) ---
+    # Les stats et la paie font de simples SUM, sans recalculer durée / pauses ligne par ligne.
+    # NULL = pas encore calculé (anciens shifts : voir backfill_shift_totals.py)
+    worked_minutes = Column(Integer, nullable=True)
+    paid_minutes = Column(Integer, nullable=True)
+    break_minutes = Column(Integer, nullable=True) # Pauses réelles (break_times si pause "rigid")
+    cost_cents = Column(Integer, nullable=True) # paid_minutes x taux horaire de l'employé, en centimes
+
+    version = Column(Integer, nullable=False, default=1) # +1 à chaque UPDATE
+    __mapper_args__ = {"version_id_col": version}
     
     user_id = Column(Integer, ForeignKey("users.id"))
     user = relationship("User", back_populates="shifts")
 
+    # Copie de user.establishment_id (dénormalisée) : le planning d'un établissement se lit
+    # sans jointure sur users. Tenue à jour par les events plus bas (création, modif, mutation).
+    establishment_id = Column(Integer, ForeignKey("establishments.id"), nullable=True)
+
+    # Index composite : "les shifts de cet employé sur cette semaine" = un simple range scan
+    __table_args__ = (
+        Index("ix_shifts_user_id_planned_start", "user_id", "planned_start"),
+        # "les shifts de cet établissement sur cette semaine", déjà triés pour la pagination
+        Index("ix_shifts_establishment_id_planned_start", "establishment_id", "planned_start", "id"),
+        # Pour la pagination par curseur (planned_start, id)
+        Index("ix_shifts_planned_start_id", "planned_start", "id"),
+    )
+
 class ShiftTemplate(Base):
     __tablename__ = "shift_templates"
 
@@ -67,6 +97,125 @@ class ShiftTemplate(Base):
     break_duration = Column(Integer, default=0)
     break_times = Column(JSON, nullable=True)
     break_paid = Column(Boolean, default=False)
+
+    version = Column(Integer, nullable=False, default=1) # +1 à chaque UPDATE
+    __mapper_args__ = {"version_id_col": version}
     
-    establishment_id = Column(Integer, ForeignKey("establishments.id"))
-    establishment = relationship("Establishment", back_populates="shift_templates")
\ No newline at end of file
+    establishment_id = Column(Integer, ForeignKey("establishments.id"), index=True)
+    establishment = relationship("Establishment", back_populates="shift_templates")
+
+# --- INVITATIONS À ENVOYER ("outbox") ---
+# La route n'envoie rien elle-même : elle écrit une ligne ici, dans la même transaction que l'user.
+# Un worker en tâche de fond envoie les emails par paquets (voir invitations.py).
+class InvitationOutbox(Base):
+    __tablename__ = "invitation_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    email = Column(String, nullable=False)
+    full_name = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True) # NULL = pas encore envoyée
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+
+    # "les invitations pas encore envoyées, dans l'ordre"
+    __table_args__ = (Index("ix_invitation_outbox_sent_at_id", "sent_at", "id"),)
+
+# --- JOURNAL DES MODIFICATIONS DE SHIFTS (pour la synchro incrémentale) ---
+# Une ligne par création / modif / suppression. L'id sert de "curseur" au client :
+# "donne-moi tout ce qui a changé depuis le curseur 1234".
+class ShiftChange(Base):
+    __tablename__ = "shift_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    shift_id = Column(Integer, nullable=False, index=True) # Pas de ForeignKey : le shift peut avoir été supprimé
+    user_id = Column(Integer, nullable=True)
+    # Établissement du shift AU MOMENT de l'événement : la synchro d'un établissement filtre dessus
+    # (sans jointure sur users), et voit donc aussi partir les shifts d'un employé muté.
+    establishment_id = Column(Integer, nullable=True)
+    op = Column(String, nullable=False) # "created", "updated" ou "deleted"
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # "ce qui a changé dans cet établissement depuis le curseur"
+        Index("ix_shift_changes_establishment_id_id", "establishment_id", "id"),
+        # Les écritures récentes, pour le curseur "sûr" (voir current_shift_cursor dans main.py)
+        Index("ix_shift_changes_changed_at", "changed_at"),
+    )
+
+def log_shift_changes(connection, shifts, op, establishment_id=None):
+    # On écrit dans la MÊME transaction que la modif des shifts (un seul INSERT groupé)
+    # shifts : objets ou lignes avec .id, .user_id et .establishment_id
+    # establishment_id : pour forcer un autre établissement (ex: celui qu'un shift vient de quitter)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "shift_id": shift.id, "user_id": shift.user_id, "op": op, "changed_at": now,
+            "establishment_id": shift.establishment_id if establishment_id is None else establishment_id,
+        }
+        for shift in shifts
+    ]
+    if rows:
+        connection.execute(ShiftChange.__table__.insert(), rows)
+
+def log_shift_change(connection, shift, op):
+    log_shift_changes(connection, [shift], op)
+
+@event.listens_for(Shift, "after_insert")
+def shift_created(mapper, connection, target):
+    log_shift_change(connection, target, "created")
+
+@event.listens_for(Shift, "after_update")
+def shift_updated(mapper, connection, target):
+    # Le shift a changé d'établissement (nouvel employé) : l'ancien le voit "supprimé"
+    old = attributes.get_history(target, "establishment_id").deleted
+    if old and old[0] is not None and old[0] != target.establishment_id:
+        log_shift_changes(connection, [target], "deleted", establishment_id=old[0])
+    log_shift_change(connection, target, "updated")
+
+@event.listens_for(Shift, "after_delete")
+def shift_deleted(mapper, connection, target):
+    log_shift_change(connection, target, "deleted")
+
+
+# --- ÉTABLISSEMENT DES SHIFTS (copie de celui de l'employé) ---
+# Les routes le renseignent elles-mêmes quand elles connaissent déjà l'employé (pas de requête en plus).
+# Sinon, on le lit ici, juste avant l'INSERT / l'UPDATE.
+def user_establishment_id(connection, user_id):
+    if user_id is None:
+        return None
+    return connection.execute(select(User.establishment_id).where(User.id == user_id)).scalar()
+
+@event.listens_for(Shift, "before_insert")
+def shift_set_establishment(mapper, connection, target):
+    if target.establishment_id is None:
+        target.establishment_id = user_establishment_id(connection, target.user_id)
+
+@event.listens_for(Shift, "before_update")
+def shift_follow_user(mapper, connection, target):
+    # Le shift change d'employé -> il suit l'établissement du nouvel employé
+    if attributes.get_history(target, "user_id").has_changes():
+        target.establishment_id = user_establishment_id(connection, target.user_id)
+
+@event.listens_for(User, "after_update")
+def user_transferred(mapper, connection, target):
+    # Mutation d'un employé : ses shifts changent d'établissement avec lui
+    # (comme avant, quand le planning filtrait sur l'établissement ACTUEL de l'employé)
+    if not attributes.get_history(target, "establishment_id").has_changes():
+        return
+    moved = connection.execute(
+        select(Shift.id, Shift.user_id, Shift.establishment_id).where(Shift.user_id == target.id)
+    ).all()
+    if not moved:
+        return
+    connection.execute(
+        update(Shift.__table__)
+        .where(Shift.__table__.c.user_id == target.id)
+        .values(establishment_id=target.establishment_id, version=Shift.__table__.c.version + 1)
+    )
+    # L'ancien établissement voit partir les shifts ("deleted"), le nouveau les voit arriver.
+    # Dans cet ordre : sans filtre d'établissement, le DERNIER événement (updated) l'emporte.
+    left = [row for row in moved if row.establishment_id is not None and row.establishment_id != target.establishment_id]
+    log_shift_changes(connection, left, "deleted")
+    log_shift_changes(connection, moved, "updated", establishment_id=target.establishment_id)
@@ -0,0 +1,44 @@
+import base64
+import binascii
+import json
+from typing import Optional
+from fastapi import HTTPException
+
+# Pagination par curseur ("keyset") : au lieu de OFFSET (qui relit toutes les lignes sautées),
+# on repart de la dernière clé vue -> la page 1000 coûte autant que la page 1.
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000 # Plafond dur : aucune requête ne peut aspirer toute une table
+
+def encode_cursor(values: dict) -> str:
+    # Le client ne doit pas interpréter le curseur : on l'emballe en base64
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> Optional[dict]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return values
+
+def decode_id_cursor(cursor: Optional[str]) -> int:
+    # Curseur {"id": ...} (users, établissements) -> dernier id vu, 0 s'il n'y a pas de curseur
+    after = decode_cursor(cursor)
+    if not after:
+        return 0
+    try:
+        return int(after["id"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+
+def split_page(rows, limit: int, cursor_of):
+    # On a demandé limit + 1 lignes : s'il y en a une de trop, il existe une page suivante
+    items = list(rows[:limit])
+    next_cursor = encode_cursor(cursor_of(items[-1])) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
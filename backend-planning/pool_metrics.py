@@ -0,0 +1,110 @@
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Compteurs du pool de connexions, alimentés par les events SQLAlchemy.
+# But : dimensionner le pool à partir de vraies mesures (et pas au pif).
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_out = 0     # Connexions actuellement prêtées
+        self.checkouts = 0       # Total des emprunts
+        self.connects = 0        # Nouvelles connexions DBAPI ouvertes
+        self.invalidations = 0   # Connexions jetées (ex: pre-ping raté)
+        self.timeouts = 0        # Attentes qui ont dépassé pool_timeout
+        self.wait_count = 0
+        self.wait_total = 0.0    # Temps total passé à attendre une connexion (secondes)
+        self.wait_max = 0.0
+        self.pool = None
+
+    def attach(self, pool):
+        self.pool = pool
+        pool.metrics = self # Utilisé par TimedPoolMixin pour les temps d'attente
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out = max(0, self.checked_out - 1)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = {
+                "checked_out": self.checked_out,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_count": self.wait_count,
+                "wait_total_seconds": round(self.wait_total, 6),
+                "wait_max_seconds": round(self.wait_max, 6),
+                "wait_avg_seconds": round(self.wait_total / self.wait_count, 6) if self.wait_count else 0.0,
+            }
+        # Infos fournies directement par le pool (QueuePool uniquement)
+        if isinstance(self.pool, QueuePool):
+            stats["pool_size"] = self.pool.size()
+            stats["overflow"] = max(0, self.pool.overflow())
+            stats["idle"] = self.pool.checkedin()
+        stats["pool_class"] = type(self.pool).__name__ if self.pool is not None else None
+        return stats
+
+
+class TimedPoolMixin:
+    # Mesure le temps d'attente d'une connexion : les events "checkout" arrivent
+    # APRÈS l'attente, donc on chronomètre directement la récupération dans le pool.
+    metrics = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Le pool recréé (ex: engine.dispose()) garde les mêmes compteurs
+        # (les listeners d'events sont déjà recopiés par SQLAlchemy)
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = new_pool
+        return new_pool
+
+
+class TimedQueuePool(TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,100 @@
+import hashlib
+import os
+import threading
+import orjson
+from cache import TTLCache
+
+# Cache des données de référence (modèles de shifts, établissements) :
+# elles changent quelques fois par mois mais sont relues à chaque chargement du planning.
+#
+# On garde en mémoire le JSON déjà encodé (+ son ETag). Invalidation par "génération" :
+# chaque espace de noms ("templates:3", "establishments"...) a un numéro de génération qui fait
+# partie de la clé. Invalider = incrémenter ce numéro -> les anciennes entrées ne sont plus lues
+# (elles sortent ensuite du LRU ou expirent). Les numéros sont dans un "backend" :
+# - en mémoire par défaut (un seul process)
+# - partagé (Redis) avec CACHE_BACKEND_URL=redis://... : une invalidation faite par un worker
+#   uvicorn est vue par tous les autres (pip install redis)
+
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "256"))
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300")) # secondes
+REFERENCE_MAX_AGE = int(os.getenv("REFERENCE_MAX_AGE", "0")) # Cache navigateur (0 = toujours revalider avec l'ETag)
+CACHE_BACKEND_URL = os.getenv("CACHE_BACKEND_URL")
+
+class MemoryGenerationBackend:
+    # Stand-in local : les générations vivent dans le process
+    def __init__(self):
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> int:
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+class RedisGenerationBackend:
+    # Partagé entre les workers : un GET par lecture, un INCR par invalidation
+    def __init__(self, url: str, prefix: str = "planning:cache-generation:"):
+        import redis # Optionnel : seulement si CACHE_BACKEND_URL est configuré
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def generation(self, namespace: str) -> int:
+        return int(self.client.get(self.prefix + namespace) or 0)
+
+    def bump(self, namespace: str):
+        self.client.incr(self.prefix + namespace)
+
+def make_backend(url):
+    if not url:
+        return MemoryGenerationBackend()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisGenerationBackend(url)
+    raise ValueError(f"CACHE_BACKEND_URL non supportée : {url}")
+
+class CachedJSON:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+class ReferenceCache:
+    def __init__(self, maxsize: int, ttl: float, backend):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.backend = backend
+
+    def key(self, namespace: str, *parts):
+        # À calculer AVANT de lire la base : si une écriture invalide entre-temps,
+        # ce qu'on stockera sera rangé sous l'ancienne génération (donc jamais relu)
+        return (namespace, self.backend.generation(namespace)) + parts
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, payload) -> CachedJSON:
+        entry = CachedJSON(orjson.dumps(payload))
+        self.entries.set(key, entry)
+        return entry
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.bump(namespace)
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    def stats(self):
+        return self.entries.stats()
+
+reference_cache = ReferenceCache(REFERENCE_CACHE_SIZE, REFERENCE_CACHE_TTL, make_backend(CACHE_BACKEND_URL))
+
+def cache_control() -> str:
+    # "private" : les données dépendent de l'établissement ; l'ETag permet un 304 sans renvoyer le corps
+    return f"private, max-age={REFERENCE_MAX_AGE}" if REFERENCE_MAX_AGE > 0 else "private, no-cache"
+
+# Espaces de noms (un par établissement pour les modèles)
+def templates_namespace(establishment_id) -> str:
+    return f"templates:{establishment_id or 'all'}"
+
+ESTABLISHMENTS_NAMESPACE = "establishments"
@@ -0,0 +1,41 @@
+import os
+import time
+
+# "Read-your-writes" avec un réplica de lecture :
+# le réplica a toujours un petit retard sur la base principale. Un client qui vient d'écrire
+# (POST / PUT / DELETE réussi) reçoit l'en-tête X-Primary-Until. Tant qu'il le renvoie et que
+# l'échéance n'est pas passée, ses lectures restent sur la base principale -> il voit sa modif.
+
+PRIMARY_PIN_HEADER = "X-Primary-Until"
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")) # 0 = désactivé
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+def pinned_to_primary(request) -> bool:
+    value = request.headers.get(PRIMARY_PIN_HEADER)
+    if not value:
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+class PrimaryPinMiddleware:
+    # Middleware ASGI "pur" (comme MetricsMiddleware) : ajoute l'en-tête aux réponses des écritures
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in WRITE_METHODS or READ_YOUR_WRITES_SECONDS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PRIMARY_PIN_HEADER.lower().encode(), until.encode())
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
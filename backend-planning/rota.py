@@ -0,0 +1,293 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappop
+from typing import Dict, List
+import models
+
+# Outils "métier" du planning (sans FastAPI) : génération de shifts depuis les modèles, détection des chevauchements,
+# remplissage automatique (auto_fill).
+
+def parse_time(value: str) -> time:
+    # "09:00" ou "09:00:00"
+    return time.fromisoformat(value)
+
+def template_hours(template: models.ShiftTemplate, day: date):
+    # Début / fin concrets du modèle pour CE jour-là
+    start = datetime.combine(day, parse_time(template.start_time))
+    end = datetime.combine(day, parse_time(template.end_time))
+    if end <= start:
+        # Shift de nuit (ex: 22:00 -> 06:00) : il finit le lendemain
+        end += timedelta(days=1)
+    return start, end
+
+def template_days(template: models.ShiftTemplate, start_date: date, end_date: date) -> List[date]:
+    # Les jours compatibles avec le modèle entre start_date et end_date (inclus)
+    # applicable_days : 0 = lundi ... 6 = dimanche (comme date.weekday())
+    days = set(template.applicable_days if template.applicable_days is not None else range(7))
+    result = []
+    day = start_date
+    while day <= end_date:
+        if day.weekday() in days:
+            result.append(day)
+        day += timedelta(days=1)
+    return result
+
+def template_shift(template: models.ShiftTemplate, user_id: int, start: datetime, end: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "establishment_id": template.establishment_id, # Les employés sont ceux de l'établissement du modèle
+        "planned_start": start,
+        "planned_end": end,
+        "position": template.position,
+        "type": "work",
+        "break_type": template.break_type,
+        "break_duration": template.break_duration or 0,
+        "break_times": template.break_times,
+        "break_paid": bool(template.break_paid),
+    }
+
+def expand_template(template: models.ShiftTemplate, user_ids: List[int], start_date: date, end_date: date) -> List[dict]:
+    # Une ligne de shift par (employé, jour compatible) entre start_date et end_date (inclus)
+    rows = []
+    for day in template_days(template, start_date, end_date):
+        start, end = template_hours(template, day)
+        for user_id in user_ids:
+            rows.append(template_shift(template, user_id, start, end))
+    return rows
+
+def break_minutes(break_type: str, break_duration: int, break_times) -> int:
+    # Pause "rigid" : la durée vient des créneaux fixes ([{"start": "12:00", "end": "12:30"}, ...]),
+    # break_duration y vaut 0 (voir ShiftsPage.jsx). Sinon ("flexible") : break_duration.
+    if break_type != "rigid" or not break_times:
+        return break_duration or 0
+    total = 0
+    for slot in break_times:
+        try:
+            start, end = parse_time(slot["start"]), parse_time(slot["end"])
+        except (KeyError, TypeError, ValueError):
+            continue # Créneau vide ou incomplet (ex: ligne ajoutée puis jamais remplie)
+        minutes = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+        if minutes < 0:
+            minutes += 24 * 60 # Pause à cheval sur minuit
+        total += minutes
+    return total
+
+def shift_minutes(start: datetime, end: datetime, break_duration: int, break_paid: bool, break_type: str = None, break_times=None):
+    # (minutes travaillées, minutes payées) : la pause n'est jamais travaillée,
+    # mais elle est payée si break_paid
+    total = (end - start).total_seconds() / 60
+    breaks = break_minutes(break_type, break_duration, break_times)
+    worked = max(0, total - breaks)
+    paid = worked + breaks if break_paid else worked
+    return round(worked), round(paid)
+
+def cost_cents(paid_minutes: int, hourly_rate: float) -> int:
+    # Coût en centimes (entier) : les SUM en base restent exacts, sans flottants
+    return round((paid_minutes or 0) * (hourly_rate or 0) * 100 / 60)
+
+def shift_totals(
+    shift_type: str, start: datetime, end: datetime, break_duration: int, break_paid: bool, hourly_rate: float,
+    break_type: str = None, break_times=None,
+) -> dict:
+    # Les colonnes précalculées d'un shift (worked_minutes, paid_minutes, break_minutes, cost_cents)
+    # Les congés (type != "work") ne comptent ni en heures ni en coût
+    if shift_type not in (None, "work"):
+        worked, paid, breaks = 0, 0, 0
+    else:
+        breaks = break_minutes(break_type, break_duration, break_times)
+        worked, paid = shift_minutes(start, end, breaks, break_paid)
+        breaks = min(breaks, round((end - start).total_seconds() / 60)) # travaillé + pause = durée du shift
+    return {"worked_minutes": worked, "paid_minutes": paid, "break_minutes": breaks, "cost_cents": cost_cents(paid, hourly_rate)}
+
+def find_overlaps(intervals):
+    # Détecte les chevauchements SANS comparer toutes les paires (O(n log n + conflits)).
+    # intervals : liste de (clé, groupe, début, fin) ; on ne compare qu'au sein d'un même groupe (= employé).
+    # Renvoie la liste des paires (clé_a, clé_b) qui se chevauchent.
+    by_group = defaultdict(list)
+    for key, group, start, end in intervals:
+        by_group[group].append((start, end, key))
+
+    pairs = []
+    for items in by_group.values():
+        # On balaie les shifts dans l'ordre chronologique en gardant ceux "encore en cours"
+        items.sort(key=lambda item: (item[0], item[1]))
+        active = [] # tas trié par heure de fin : (fin, n°, clé)
+        for seq, (start, end, key) in enumerate(items):
+            while active and active[0][0] <= start:
+                heappop(active) # Terminé avant qu'on commence : plus de chevauchement possible
+            for _, _, other in active:
+                pairs.append((other, key))
+            heappush(active, (end, seq, key))
+    return pairs
+
+
+# --- REMPLISSAGE AUTOMATIQUE (POST /planning/auto-fill) ---
+def week_of(moment: datetime) -> date:
+    # Le lundi de la semaine : c'est la clé des plafonds d'heures hebdomadaires
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+def whole_days(start: datetime, end: datetime):
+    # Un congé bloque les journées ENTIÈRES qu'il touche : le planning enregistre souvent
+    # un congé comme un simple 09:00 -> 17:00, l'employé n'est pas libre le soir pour autant.
+    first = datetime.combine(start.date(), time.min)
+    last = datetime.combine(end.date(), time.min)
+    if last < end:
+        last += timedelta(days=1) # Jusqu'au minuit qui suit la fin
+    return first, max(last, first + timedelta(days=1))
+
+class Timeline:
+    # Les créneaux déjà pris par UN employé, triés par début.
+    # Vérifier un chevauchement = deux recherches dichotomiques, pas un parcours de tout l'agenda.
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.longest = timedelta(0)
+
+    def add(self, start: datetime, end: datetime):
+        index = bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        self.longest = max(self.longest, end - start)
+
+    def remove(self, start: datetime, end: datetime):
+        # "longest" n'est pas recalculé : il ne sert qu'à borner la recherche, trop grand reste juste
+        index = bisect_left(self.starts, start)
+        while self.ends[index] != end:
+            index += 1
+        del self.starts[index]
+        del self.ends[index]
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        # Seuls les créneaux commencés après (start - le plus long créneau) peuvent encore être en cours
+        first = bisect_right(self.starts, start - self.longest)
+        last = bisect_left(self.starts, end)
+        return all(self.ends[i] <= start for i in range(first, last))
+
+def auto_fill(slots: List[dict], hourly_rates: Dict[int, float], busy: List[tuple], weekly_caps: Dict[int, int]):
+    # Affecte des employés aux créneaux à pourvoir : d'abord couvrir le plus de places possible, puis à moindre coût.
+    # slots : [{"start", "end", "needed", "worked_minutes", "paid_minutes"}] (un créneau = un modèle, un jour)
+    # hourly_rates : {user_id: taux horaire} des employés disponibles
+    # busy : [(user_id, début, fin, minutes travaillées)] shifts et congés déjà en base
+    # weekly_caps : {user_id: minutes travaillées max par semaine}
+    #
+    # C'est une HEURISTIQUE, pas un optimum garanti (plafonds hebdo + chevauchements : le problème exact
+    # est combinatoire). En deux temps :
+    # 1. Glouton : les créneaux dans l'ordre chronologique, et pour chacun les employés les moins chers
+    #    d'abord (à taux égal, le moins chargé de la semaine).
+    # 2. Réparation, tant qu'elle trouve mieux :
+    #    - une place vide : on y met un employé en le retirant d'un autre créneau, que quelqu'un d'autre reprend ;
+    #    - un employé remplacé par un moins cher, seul ou en échangeant leurs deux créneaux.
+    # Un employé n'est jamais pris s'il chevauche un autre de ses shifts ou dépasse son plafond.
+    # Renvoie (affectations [(index du créneau, user_id)], manques {index du créneau: places non pourvues}).
+    timelines = {user_id: Timeline() for user_id in hourly_rates}
+    planned = defaultdict(int) # (user_id, lundi) -> minutes travaillées
+    for user_id, start, end, worked in busy:
+        if user_id in timelines:
+            timelines[user_id].add(start, end)
+            planned[(user_id, week_of(start))] += worked or 0
+
+    staffed = [set() for _ in slots] # index du créneau -> employés affectés
+    taken = defaultdict(set) # user_id -> index des créneaux qu'on lui a affectés
+
+    def cost(index, user_id):
+        return (hourly_rates[user_id] or 0) * slots[index].get("paid_minutes", slots[index]["worked_minutes"])
+
+    def fits(index, user_id):
+        slot = slots[index]
+        return (
+            user_id not in staffed[index]
+            and planned[(user_id, week_of(slot["start"]))] + slot["worked_minutes"] <= weekly_caps[user_id]
+            and timelines[user_id].is_free(slot["start"], slot["end"])
+        )
+
+    def take(index, user_id):
+        slot = slots[index]
+        timelines[user_id].add(slot["start"], slot["end"])
+        planned[(user_id, week_of(slot["start"]))] += slot["worked_minutes"]
+        staffed[index].add(user_id)
+        taken[user_id].add(index)
+
+    def release(index, user_id):
+        slot = slots[index]
+        timelines[user_id].remove(slot["start"], slot["end"])
+        planned[(user_id, week_of(slot["start"]))] -= slot["worked_minutes"]
+        staffed[index].discard(user_id)
+        taken[user_id].discard(index)
+
+    by_rate = sorted(hourly_rates, key=lambda user_id: (hourly_rates[user_id] or 0, user_id))
+
+    # 1. Glouton
+    order = sorted(range(len(slots)), key=lambda index: (slots[index]["start"], slots[index]["end"]))
+    for index in order:
+        slot = slots[index]
+        week = week_of(slot["start"])
+        for user_id in sorted(by_rate, key=lambda user_id: (hourly_rates[user_id] or 0, planned[(user_id, week)], user_id)):
+            if len(staffed[index]) == slot["needed"]:
+                break
+            if fits(index, user_id):
+                take(index, user_id)
+
+    # 2. Réparation
+    def fill(index):
+        # Une place de plus sur ce créneau : directement, ou en déplaçant un employé (chaîne de longueur 2)
+        for user_id in by_rate:
+            if fits(index, user_id):
+                take(index, user_id)
+                return True
+        for user_id in by_rate:
+            if user_id in staffed[index]:
+                continue
+            for other in list(taken[user_id]):
+                release(other, user_id)
+                if fits(index, user_id):
+                    take(index, user_id)
+                    for replacement in by_rate:
+                        if replacement != user_id and fits(other, replacement):
+                            take(other, replacement)
+                            return True
+                    release(index, user_id)
+                take(other, user_id)
+        return False
+
+    def cheapen(index, user_id):
+        # Remplacer user_id sur ce créneau par un employé moins cher (seul, ou en échange d'un de ses créneaux)
+        for cheaper in by_rate:
+            if cost(index, cheaper) >= cost(index, user_id):
+                break
+            if cheaper in staffed[index]:
+                continue
+            release(index, user_id)
+            if fits(index, cheaper):
+                take(index, cheaper)
+                return True
+            for other in list(taken[cheaper]):
+                if cost(index, user_id) + cost(other, cheaper) <= cost(index, cheaper) + cost(other, user_id):
+                    continue
+                release(other, cheaper)
+                if fits(index, cheaper):
+                    take(index, cheaper)
+                    if fits(other, user_id):
+                        take(other, user_id)
+                        return True
+                    release(index, cheaper)
+                take(other, cheaper)
+            take(index, user_id)
+        return False
+
+    improved = True
+    while improved:
+        # Chaque tour couvre une place de plus ou baisse le coût à couverture égale : la boucle s'arrête
+        improved = False
+        for index in order:
+            while len(staffed[index]) < slots[index]["needed"] and fill(index):
+                improved = True
+        for index in order:
+            for user_id in list(staffed[index]):
+                if cheapen(index, user_id):
+                    improved = True
+
+    assignments = [(index, user_id) for index in order for user_id in sorted(staffed[index])]
+    missing = {index: slots[index]["needed"] - len(staffed[index]) for index in order if len(staffed[index]) < slots[index]["needed"]}
+    return assignments, missing
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, field_validator
+from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from enum import Enum
 
@@ -44,6 +44,7 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     role: Optional[str] = None # Ou Optional[UserRole] si tu as l'enum importé
     hourly_rate: Optional[float] = None
+    establishment_id: Optional[int] = None # Mutation : les shifts de l'employé suivent (voir models.py)
 
 class UserSetup(BaseModel):
     token: str
@@ -60,9 +61,27 @@ class UserResponse(UserBase):
     class Config:
         from_attributes = True
 
+# --- IMPORT D'ÉQUIPE EN MASSE (POST /users/bulk, JSON ou CSV) ---
+class UserBulkError(BaseModel):
+    index: int # Position dans la liste envoyée (ou n° de ligne du CSV, sans l'en-tête, à partir de 0)
+    email: Optional[str] = None
+    detail: str
+
+class UserBulkResponse(BaseModel):
+    created: List[UserResponse] = []
+    errors: List[UserBulkError] = []
+
+# Les horaires sont des heures LOCALES sans fuseau (colonnes DateTime "naïves", comme le front les envoie :
+# "2026-10-19T09:00"). Une date avec fuseau ("...Z", "+02:00") est refusée (422) : la comparer aux
+# dates en base ferait planter la détection de chevauchements, et ignorer le fuseau décalerait le shift.
+def naive_datetime(value):
+    if value is not None and value.tzinfo is not None:
+        raise ValueError("Date sans fuseau horaire attendue (heure locale, ex: 2026-10-19T09:00)")
+    return value
+
 class ShiftBase(BaseModel):
-    planned_start: str
-    planned_end: str
+    planned_start: datetime
+    planned_end: datetime
     position: str
     type: str = "work"
     quantity: Optional[float] = None
@@ -73,12 +92,20 @@ class ShiftBase(BaseModel):
     break_times: Optional[List[Dict[str, Any]]] = None
     break_paid: bool = False
 
+    _naive_dates = field_validator("planned_start", "planned_end")(naive_datetime)
+
 class ShiftCreate(ShiftBase):
     user_id: int
 
+def required_datetime(value):
+    # Dans une modif, "planned_start": null ne veut rien dire : les colonnes sont NOT NULL
+    if value is None:
+        raise ValueError("Date obligatoire (omettre le champ pour ne pas le modifier)")
+    return naive_datetime(value)
+
 class ShiftUpdate(BaseModel):
-    planned_start: Optional[str] = None
-    planned_end: Optional[str] = None
+    planned_start: Optional[datetime] = None
+    planned_end: Optional[datetime] = None
     position: Optional[str] = None
     type: Optional[str] = None
     quantity: Optional[float] = None
@@ -87,12 +114,51 @@ class ShiftUpdate(BaseModel):
     break_times: Optional[List[Dict[str, Any]]] = None
     break_paid: Optional[bool] = None
 
+    _naive_dates = field_validator("planned_start", "planned_end")(required_datetime)
+
 class ShiftResponse(ShiftBase):
     id: int
     user_id: int
+    # Calculés par le serveur (pauses comprises) ; null tant que le backfill n'est pas passé
+    worked_minutes: Optional[int] = None
+    paid_minutes: Optional[int] = None
+    break_minutes: Optional[int] = None
+    cost_cents: Optional[int] = None
     class Config:
         orm_mode = True
 
+# --- PAGES (pagination par curseur) ---
+# "next_cursor" est à renvoyer tel quel dans ?cursor= ; il vaut null sur la dernière page
+class EstablishmentPage(BaseModel):
+    items: List[EstablishmentResponse] = []
+    next_cursor: Optional[str] = None
+
+class UserPage(BaseModel):
+    items: List[UserResponse] = []
+    next_cursor: Optional[str] = None
+
+class ShiftPage(BaseModel):
+    items: List[ShiftResponse] = []
+    next_cursor: Optional[str] = None
+
+# --- SYNCHRO INCRÉMENTALE (ce qui a changé depuis un curseur) ---
+class ShiftChangesResponse(BaseModel):
+    cursor: int # À renvoyer dans "since" au prochain appel
+    has_more: bool = False
+    upserted: List[ShiftResponse] = [] # Shifts créés ou modifiés (état actuel)
+    deleted: List[int] = []            # Ids des shifts supprimés
+
+# --- CRÉATION EN MASSE (ex: congés sur plusieurs jours) ---
+class ShiftBulkError(BaseModel):
+    index: int # Position de l'élément dans la liste envoyée
+    detail: str
+    conflicting_shift_ids: List[int] = [] # Shifts déjà en base qui chevauchent celui-ci
+    conflicting_indexes: List[int] = []   # Autres éléments du même lot qui chevauchent celui-ci
+
+class ShiftBulkResponse(BaseModel):
+    created: List[ShiftResponse] = []
+    errors: List[ShiftBulkError] = []
+
 # --- SHIFT TEMPLATES ---
 class ShiftTemplateBase(BaseModel):
     name: str
@@ -114,4 +180,100 @@ class ShiftTemplateResponse(ShiftTemplateBase):
     id: int
     establishment_id: int
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# --- VÉRIFICATION D'UN LOT (chevauchements) ---
+class ShiftConflict(BaseModel):
+    index: int
+    conflicting_shift_ids: List[int] = [] # Shifts déjà en base
+    conflicting_indexes: List[int] = []   # Autres éléments du même lot
+
+class ShiftValidationResponse(BaseModel):
+    valid: bool
+    conflicts: List[ShiftConflict] = []
+    errors: List[ShiftBulkError] = []
+
+# Appliquer un modèle sur une période (génération des shifts côté serveur)
+class TemplateApplyRequest(BaseModel):
+    user_ids: List[int]
+    start_date: date
+    end_date: date # Incluse
+
+class MultiTemplateApplyRequest(TemplateApplyRequest):
+    template_ids: List[int]
+
+class TemplateApplyResponse(BaseModel):
+    created_count: int
+    conflict_count: int = 0 # Shifts non créés car ils chevauchaient un shift existant
+    skipped_user_ids: List[int] = [] # Employés inconnus ou d'un autre établissement
+    shifts: List[ShiftResponse] = []
+
+# --- PLANNING (tout l'écran en une seule réponse) ---
+class PlanningResponse(BaseModel):
+    establishment_id: int
+    week_start: date
+    cursor: int = 0 # Pour enchaîner avec /shifts/changes
+    users: List[UserResponse] = []
+    shifts: List[ShiftResponse] = []
+    templates: List[ShiftTemplateResponse] = []
+
+# --- REMPLISSAGE AUTOMATIQUE (POST /planning/auto-fill) ---
+# Heuristique : couvre le plus de places possible, puis réduit le coût, sans garantir le planning le moins cher
+class CoverageRequirement(BaseModel):
+    template_id: int
+    count: int = 1 # Nombre d'employés voulus sur le créneau
+    day: Optional[date] = None # Un jour précis ; sinon chaque jour du modèle sur la période
+
+class AutoFillRequest(BaseModel):
+    establishment_id: int
+    start_date: date
+    end_date: date # Incluse
+    requirements: List[CoverageRequirement]
+    max_weekly_hours: float = 35 # Plafond par défaut (heures travaillées, shifts existants compris)
+    weekly_hours: Dict[int, float] = {} # Plafond propre à un employé : {user_id: heures}
+    user_ids: Optional[List[int]] = None # Par défaut : toute l'équipe de l'établissement
+    commit: bool = False # False = simple aperçu, rien n'est enregistré
+
+# Directement renvoyable à POST /shifts/bulk (les champs en plus sont ignorés)
+class AutoFillShift(ShiftCreate):
+    template_id: int
+    worked_minutes: int
+    paid_minutes: int
+    cost_cents: int
+
+class AutoFillGap(BaseModel):
+    template_id: int
+    day: date
+    needed: int
+    missing: int # Places restées vides (personne de libre sous son plafond)
+
+class AutoFillResponse(BaseModel):
+    committed: bool = False
+    total_cost_cents: int = 0
+    total_paid_minutes: int = 0
+    shifts: List[AutoFillShift] = []
+    created: List[ShiftResponse] = [] # Rempli seulement si commit
+    unfilled: List[AutoFillGap] = []
+
+# --- STATISTIQUES (Heures & coût) ---
+class LabourDayStats(BaseModel):
+    day: date
+    worked_minutes: int
+    paid_minutes: int
+    cost: float
+
+class LabourUserStats(BaseModel):
+    user_id: int
+    worked_minutes: int   # Temps travaillé (pauses déduites)
+    break_minutes: int    # Total des pauses
+    paid_minutes: int     # Temps payé (travail + pauses payées)
+    cost: float           # paid_minutes x taux horaire
+    days: List[LabourDayStats] = []
+
+class LabourStatsResponse(BaseModel):
+    start: datetime
+    end: datetime
+    total_worked_minutes: int = 0
+    total_paid_minutes: int = 0
+    total_cost: float = 0
+    users: List[LabourUserStats] = []
@@ -5,6 +5,10 @@ const api = axios.create({
   baseURL: 'http://127.0.0.1:8000', // L'adresse de ton Backend FastAPI
 });
 
+// RÉPLICA DE LECTURE : après une écriture, le back renvoie X-Primary-Until.
+// On le renvoie tant qu'il est valable -> nos lectures voient tout de suite nos propres modifs.
+let primaryUntil = null;
+
 // INTERCEPTEUR : On injecte le token automatiquement
 api.interceptors.request.use(
   (config) => {
@@ -12,10 +16,33 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    if (primaryUntil && Number(primaryUntil) * 1000 > Date.now()) {
+      config.headers['X-Primary-Until'] = primaryUntil;
+    }
     return config;
   },
   (error) => Promise.reject(error)
 );
 
+api.interceptors.response.use((response) => {
+  const until = response.headers['x-primary-until'];
+  if (until) {
+    primaryUntil = until;
+  }
+  return response;
+});
+
+// PAGINATION : les listes (/users, /establishments, /shifts) arrivent par pages
+// { items, next_cursor }. Cette fonction enchaîne les pages jusqu'à la dernière.
+export const fetchAllPages = async (url, params = {}) => {
+  let items = [];
+  let cursor = null;
+  do {
+    const res = await api.get(url, { params: { ...params, ...(cursor ? { cursor } : {}) } });
+    items = items.concat(res.data.items);
+    cursor = res.data.next_cursor;
+  } while (cursor);
+  return items;
+};
 
 export default api;
\ No newline at end of file
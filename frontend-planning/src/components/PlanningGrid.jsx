@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
-import { startOfWeek, addDays, format, isSameDay, parseISO, differenceInMinutes, eachDayOfInterval } from 'date-fns';
+import { startOfWeek, addDays, format, isSameDay, parseISO, eachDayOfInterval } from 'date-fns';
 import { fr } from 'date-fns/locale';
-import api from '../api';
+import api, { fetchAllPages } from '../api';
 import ShiftModal from './ShiftModal';
 
 const PlanningGrid = () => {
@@ -11,6 +11,8 @@ const PlanningGrid = () => {
   const [users, setUsers] = useState([]);
   const [shifts, setShifts] = useState([]);
   const [templates, setTemplates] = useState([]); // Pour la modale
+  const [labourStats, setLabourStats] = useState({}); // Totaux par employé (calculés par le backend)
+  const [cursor, setCursor] = useState(0); // Position dans le journal des modifs (synchro incrémentale)
   const [currentDate, setCurrentDate] = useState(new Date());
 
   // États pour la Modale
@@ -26,9 +28,9 @@ const PlanningGrid = () => {
   useEffect(() => {
     const fetchEst = async () => {
         try {
-            const res = await api.get('/establishments');
-            setEstablishments(res.data);
-            if (res.data.length > 0) setSelectedEstId(res.data[0].id);
+            const data = await fetchAllPages('/establishments');
+            setEstablishments(data);
+            if (data.length > 0) setSelectedEstId(data[0].id);
         } catch(e) { console.error(e) }
     };
     fetchEst();
@@ -39,19 +41,60 @@ const PlanningGrid = () => {
     fetchData();
   }, [selectedEstId, currentDate]);
 
+  const fetchStats = async () => {
+    // On ne demande que la semaine affichée
+    const statsRes = await api.get('/stats/labour', { params: {
+      establishment_id: selectedEstId,
+      start: format(startDate, "yyyy-MM-dd'T'HH:mm:ss"),
+      end: format(addDays(startDate, 7), "yyyy-MM-dd'T'HH:mm:ss")
+    } });
+    setLabourStats(Object.fromEntries(statsRes.data.users.map(s => [s.user_id, s])));
+  };
+
   const fetchData = async () => {
     try {
-      const params = { establishment_id: selectedEstId };
-      const usersRes = await api.get('/users', { params });
-      const shiftsRes = await api.get('/shifts', { params });
-      const templatesRes = await api.get('/shift-templates', { params });
+      // Users + shifts + modèles en UNE requête (le navigateur gère l'ETag / 304 tout seul)
+      const planningRes = await api.get('/planning', { params: {
+        establishment_id: selectedEstId,
+        week: format(startDate, 'yyyy-MM-dd')
+      } });
       
-      setUsers(usersRes.data);
-      setShifts(shiftsRes.data);
-      setTemplates(templatesRes.data);
+      setUsers(planningRes.data.users);
+      setShifts(planningRes.data.shifts);
+      setTemplates(planningRes.data.templates);
+      setCursor(planningRes.data.cursor);
+      await fetchStats();
     } catch (error) { console.error("Erreur data", error); }
   };
 
+  // Après une modif : on ne récupère QUE ce qui a changé depuis le dernier curseur
+  const syncChanges = async () => {
+    try {
+      const weekEnd = addDays(startDate, 7);
+      let since = cursor;
+      let hasMore = true;
+      let nextShifts = shifts;
+      while (hasMore) {
+        const res = await api.get('/shifts/changes', { params: { since, establishment_id: selectedEstId } });
+        const { upserted, deleted } = res.data;
+        const touched = new Set([...deleted, ...upserted.map(s => s.id)]);
+        const inWeek = upserted.filter(s => {
+          const shiftDate = parseISO(s.planned_start);
+          return shiftDate >= startDate && shiftDate < weekEnd;
+        });
+        nextShifts = nextShifts.filter(s => !touched.has(s.id)).concat(inWeek);
+        since = res.data.cursor;
+        hasMore = res.data.has_more;
+      }
+      setShifts(nextShifts);
+      setCursor(since);
+      await fetchStats();
+    } catch (error) {
+      console.error("Erreur synchro", error);
+      fetchData(); // En cas de souci, on recharge tout
+    }
+  };
+
   // --- GESTION DES CLICS ---
   const handleEmptySlotClick = (user, date) => {
     setModalContext({ userId: user.id, date: date, userName: user.full_name });
@@ -92,8 +135,8 @@ const handleSaveShift = async (formData) => {
                 end: parseISO(formData.multi_end_date)
             });
 
-            // 2. On prépare toutes les requêtes
-            const requests = dates.map(date => {
+            // 2. On prépare tous les shifts
+            const payloads = dates.map(date => {
                 const dateStr = format(date, 'yyyy-MM-dd');
                 // On crée un payload pour CE jour-là
                 const dailyPayload = {
@@ -106,18 +149,25 @@ const handleSaveShift = async (formData) => {
                     planned_start: `${dateStr}T09:00:00`,
                     planned_end: `${dateStr}T17:00:00`
                 };
-                return api.post('/shifts', dailyPayload);
+                return dailyPayload;
             });
 
-            // 3. On envoie TOUT en même temps au backend
-            await Promise.all(requests);
+            // 3. On envoie TOUT en une seule requête (une seule transaction côté backend)
+            const res = await api.post('/shifts/bulk', payloads);
+            if (res.data.errors.length > 0) {
+                alert(`${res.data.errors.length} jour(s) non enregistré(s) : ${res.data.errors[0].detail}`);
+            }
         }
 
         setIsModalOpen(false);
-        fetchData(); 
+        syncChanges(); 
     } catch (err) {
         console.error(err);
-        alert("Erreur lors de l'enregistrement");
+        if (err.response?.status === 409) {
+            alert(err.response.data.detail.message); // Double réservation refusée par le backend
+        } else {
+            alert("Erreur lors de l'enregistrement");
+        }
     }
   };
 
@@ -127,32 +177,16 @@ const handleSaveShift = async (formData) => {
           try {
               await api.delete(`/shifts/${selectedShift.id}`);
               setIsModalOpen(false);
-              fetchData();
+              syncChanges();
           } catch (err) { alert("Erreur suppression"); }
       }
   };
 
-  // --- CALCULATEUR D'HEURES (Seulement le travail pour l'instant) ---
+  // --- HEURES & COÛT (calculés par le backend, pauses comprises) ---
   const calculateStats = (user) => {
-    let totalMinutes = 0;
-    const userShifts = shifts.filter(s => {
-      if (s.user_id !== user.id) return false;
-      const shiftDate = parseISO(s.planned_start);
-      return shiftDate >= startDate && shiftDate < addDays(startDate, 7);
-    });
-
-    userShifts.forEach(shift => {
-      if (shift.type === 'work') {
-        const start = parseISO(shift.planned_start);
-        const end = parseISO(shift.planned_end);
-        totalMinutes += differenceInMinutes(end, start);
-      }
-    });
-
-    const hours = totalMinutes / 60;
-    const cost = hours * (user.hourly_rate || 0);
-
-    return { hours: hours.toFixed(1), cost: cost.toFixed(0) };
+    const stats = labourStats[user.id];
+    if (!stats) return { hours: '0.0', cost: '0' };
+    return { hours: (stats.worked_minutes / 60).toFixed(1), cost: stats.cost.toFixed(0) };
   };
 
   // --- STYLE DES SHIFTS ---
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { Plus, Store, Clock, Trash2, Coffee } from 'lucide-react'; // J'ai ajouté l'icône Coffee ☕
-import api from '../api';
+import api, { fetchAllPages } from '../api';
 
 const ShiftsPage = () => {
   const [establishments, setEstablishments] = useState([]);
@@ -47,9 +47,9 @@ const ShiftsPage = () => {
 
   const loadEstablishments = async () => {
     try {
-      const res = await api.get('/establishments');
-      setEstablishments(res.data);
-      if (res.data.length > 0 && !selectedEst) setSelectedEst(res.data[0]);
+      const data = await fetchAllPages('/establishments');
+      setEstablishments(data);
+      if (data.length > 0 && !selectedEst) setSelectedEst(data[0]);
     } catch (err) { console.error(err); }
   };
 
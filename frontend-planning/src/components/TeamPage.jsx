@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom'; // Pour la redirection
 import { Plus, MapPin, Mail, Store } from 'lucide-react';
-import api from '../api';
+import api, { fetchAllPages } from '../api';
 
 const TeamPage = () => {
   const navigate = useNavigate(); // Le GPS pour changer de page
@@ -45,10 +45,10 @@ const TeamPage = () => {
 
   const loadEstablishments = async () => {
     try {
-      const res = await api.get('/establishments');
-      setEstablishments(res.data);
+      const data = await fetchAllPages('/establishments');
+      setEstablishments(data);
       // Optionnel : Sélectionner le premier par défaut s'il y en a
-      if (res.data.length > 0 && !selectedEst) {
+      if (data.length > 0 && !selectedEst) {
         // setSelectedEst(res.data[0]); // Décommente si tu veux auto-sélectionner
       }
     } catch (err) { console.error(err); }
@@ -56,8 +56,8 @@ const TeamPage = () => {
 
   const loadEmployees = async (estId) => {
     try {
-      const res = await api.get('/users', { params: { establishment_id: estId } });
-      setEmployees(res.data);
+      const data = await fetchAllPages('/users', { establishment_id: estId });
+      setEmployees(data);
     } catch (err) { console.error(err); }
   };
 